@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""
+Entry points for asyncio event loops. The databases of the asyncio drivers (asyncpg, aiosqlite, ...) are reflected
+through an AsyncEngine and run_sync, the other inputs and the rendering run in the default executor of the loop.
+The AsyncEngine needs SQLAlchemy 1.4 or later.
+"""
+import asyncio
+import functools
+
+from sqlalchemy.engine.url import make_url
+from sqlalchemy.exc import ArgumentError
+
+from eralchemy.main import all_to_intermediary, render_intermediary
+from eralchemy.sqla import bind_to_intermediary
+
+
+def is_async_database_uri(filename_or_input):
+    """ Whether filename_or_input is the URI of a database with an asyncio driver. """
+    if not isinstance(filename_or_input, str) or filename_or_input.split('.')[-1] in ('er', 'dbml'):
+        return False
+    try:
+        return getattr(make_url(filename_or_input).get_dialect(), 'is_async', False)
+    except ArgumentError:
+        return False
+
+
+async def async_bind_to_intermediary(async_bind, **kwargs):
+    """ Reflects the database of an AsyncEngine or an AsyncConnection, see eralchemy.sqla.bind_to_intermediary. """
+    if hasattr(async_bind, 'run_sync'):
+        return await async_bind.run_sync(bind_to_intermediary, **kwargs)
+    async with async_bind.connect() as connection:
+        return await connection.run_sync(bind_to_intermediary, **kwargs)
+
+
+async def async_all_to_intermediary(filename_or_input, schema=None, include_tables=None, exclude_tables=None,
+                                    focus=None, depth=1, cache=None):
+    """ Same as eralchemy.main.all_to_intermediary without blocking the event loop. filename_or_input can also be an
+    AsyncEngine or an AsyncConnection, which are left open, or the URI of a database with an asyncio driver. """
+    kwargs = dict(schema=schema, include_tables=include_tables, exclude_tables=exclude_tables, focus=focus,
+                  depth=depth, cache=cache)
+    if filename_or_input.__class__.__name__ in ('AsyncEngine', 'AsyncConnection'):
+        return await async_bind_to_intermediary(filename_or_input, **kwargs)
+    if is_async_database_uri(filename_or_input):
+        from sqlalchemy.ext.asyncio import create_async_engine
+
+        engine = create_async_engine(filename_or_input)
+        try:
+            return await async_bind_to_intermediary(engine, **kwargs)
+        finally:
+            await engine.dispose()
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, functools.partial(all_to_intermediary, filename_or_input, **kwargs))
+
+
+async def async_render_er(input, output, mode='auto', include_tables=None, include_columns=None,
+                          exclude_tables=None, exclude_columns=None, schema=None, focus=None, depth=1, cache=None,
+                          prog='dot'):
+    """ Same as eralchemy.main.render_er in an asyncio event loop: the input is read with async_all_to_intermediary
+    and the diagram is rendered in the default executor of the loop. The errors are raised. """
+    tables, relationships = await async_all_to_intermediary(input, schema=schema, include_tables=include_tables,
+                                                            exclude_tables=exclude_tables, focus=focus, depth=depth,
+                                                            cache=cache)
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, functools.partial(
+        render_intermediary, tables, relationships, output, mode=mode,
+        include_tables=include_tables, include_columns=include_columns,
+        exclude_tables=exclude_tables, exclude_columns=exclude_columns,
+        focus=focus, depth=depth, prog=prog,
+    ))
@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+"""
+On-disk cache of the intermediary representation of reflected databases.
+An entry is reused as long as the fingerprint of the catalog of the database is unchanged, so that the repeated
+renders of an unchanged database skip the reflection. With the fingerprints of each table, only the tables which
+changed are reflected again.
+An entry is a line of JSON with the fingerprints, followed by the snapshot of the intermediary representation (see
+eralchemy.snapshot), so that loading an entry never executes code from the cache directory.
+"""
+import contextlib
+import copy
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+from sqlalchemy import text
+from sqlalchemy.engine.url import make_url
+
+from eralchemy.snapshot import snapshot_dumps, snapshot_loads
+
+# Version of the format of the entries, part of the keys so that a new format never reads the older entries.
+CACHE_FORMAT_VERSION = 1
+
+DEFAULT_TTL = 7 * 24 * 3600
+
+DEFAULT_MAX_SIZE = 100 * 2 ** 20
+
+ENTRY_SUFFIX = '.entry'
+
+POSTGRESQL_FINGERPRINT_QUERY = """
+SELECT md5(string_agg(row, ',' ORDER BY row)) FROM (
+    SELECT 'c' || c.oid || ':' || c.xmin || ':' || c.relname AS row
+    FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+    WHERE n.nspname = coalesce(:schema, current_schema())
+    UNION ALL
+    SELECT 'a' || a.attrelid || ':' || a.attnum || ':' || a.xmin
+    FROM pg_attribute a JOIN pg_class c ON c.oid = a.attrelid JOIN pg_namespace n ON n.oid = c.relnamespace
+    WHERE n.nspname = coalesce(:schema, current_schema())
+    UNION ALL
+    SELECT 'k' || k.oid || ':' || k.xmin
+    FROM pg_constraint k JOIN pg_namespace n ON n.oid = k.connamespace
+    WHERE n.nspname = coalesce(:schema, current_schema())
+) AS catalog
+"""
+
+POSTGRESQL_TABLES_FINGERPRINTS_QUERY = """
+SELECT c.relname, c.oid || ':' || c.xmin
+    || ':' || coalesce((SELECT string_agg(a.attnum || ':' || a.xmin, ',' ORDER BY a.attnum)
+                        FROM pg_attribute a WHERE a.attrelid = c.oid), '')
+    || ':' || coalesce((SELECT string_agg(k.oid || ':' || k.xmin, ',' ORDER BY k.oid)
+                        FROM pg_constraint k WHERE k.conrelid = c.oid), '')
+FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+WHERE n.nspname = coalesce(:schema, current_schema()) AND c.relkind IN ('r', 'p')
+"""
+
+
+def default_cache_directory():
+    """ Returns the directory of the cache in the user cache directory ($XDG_CACHE_HOME or ~/.cache). """
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'eralchemy')
+
+
+def sqlite_fingerprint(connection, schema):
+    """ The SQL of the objects in sqlite_master is rewritten by every change of the schema. Unlike the schema_version
+    counter, it differs between unrelated databases. """
+    master = 'sqlite_master' if schema is None else '"{}".sqlite_master'.format(schema)
+    rows = connection.execute(text('SELECT type, name, sql FROM {} ORDER BY type, name'.format(master)))
+    return hashlib.sha1(json.dumps([list(row) for row in rows]).encode('utf-8')).hexdigest()
+
+
+def postgresql_fingerprint(connection, schema):
+    """ The xmin of the rows of pg_class, pg_attribute and pg_constraint change with every change of the schema. """
+    return connection.execute(text(POSTGRESQL_FINGERPRINT_QUERY), {'schema': schema}).scalar()
+
+
+def sqlite_tables_fingerprints(connection, schema):
+    """ The SQL of a table in sqlite_master is rewritten by every change of the table. """
+    master = 'sqlite_master' if schema is None else '"{}".sqlite_master'.format(schema)
+    rows = connection.execute(text(
+        "SELECT name, sql FROM {} WHERE type = 'table' AND name NOT LIKE 'sqlite~_%' ESCAPE '~'".format(master)))
+    return dict((name, hashlib.sha1(sql.encode('utf-8')).hexdigest()) for name, sql in rows)
+
+
+def postgresql_tables_fingerprints(connection, schema):
+    """ The xmin of the rows of a table in pg_class, pg_attribute and pg_constraint change with the table. """
+    return dict(connection.execute(text(POSTGRESQL_TABLES_FINGERPRINTS_QUERY), {'schema': schema}).fetchall())
+
+
+switch_dialect_to_fingerprint = {
+    'sqlite': sqlite_fingerprint,
+    'postgresql': postgresql_fingerprint,
+}
+
+switch_dialect_to_tables_fingerprints = {
+    'sqlite': sqlite_tables_fingerprints,
+    'postgresql': postgresql_tables_fingerprints,
+}
+
+
+def connect(bind):
+    """ Returns a context manager of a new connection of an Engine, or of the Connection itself. """
+    from sqlalchemy.engine import Engine
+
+    if isinstance(bind, Engine):
+        return bind.connect()
+    return contextlib.nullcontext(bind)
+
+
+def catalog_fingerprint(bind, schemas):
+    """ Returns a string which changes whenever the tables of the schemas change, or None if the dialect of the bind
+    (an Engine or a Connection) has no cheap fingerprint (the database is then always reflected). """
+    fingerprint = switch_dialect_to_fingerprint.get(bind.dialect.name)
+    if fingerprint is None:
+        return None
+    with connect(bind) as connection:
+        return ';'.join(str(fingerprint(connection, schema)) for schema in schemas)
+
+
+def catalog_tables_fingerprints(bind, schemas):
+    """ Returns the fingerprints of the tables of the schemas, {schema: {table name: fingerprint}}, a fingerprint
+    changing whenever its table changes, or None if the dialect of the bind has no fingerprint of the tables. """
+    fingerprints = switch_dialect_to_tables_fingerprints.get(bind.dialect.name)
+    if fingerprints is None:
+        return None
+    with connect(bind) as connection:
+        return dict((schema, fingerprints(connection, schema)) for schema in schemas)
+
+
+class ReflectionCache:
+    """ Cache of the intermediary representations in a directory, one file per entry.
+    - An entry older than ttl seconds is expired.
+    - When the size of the directory exceeds max_size bytes, the least recently used entries are evicted.
+    - If incremental, the entries store the fingerprints of the tables, so that only the tables which changed are
+      reflected again (see eralchemy.sqla.update_intermediary).
+    """
+
+    def __init__(self, directory=None, ttl=DEFAULT_TTL, max_size=DEFAULT_MAX_SIZE, incremental=False):
+        self.directory = directory or default_cache_directory()
+        self.ttl = ttl
+        self.max_size = max_size
+        self.incremental = incremental
+
+    @staticmethod
+    def key(database_uri, schema=None, **options):
+        """ Returns the key of the reflection of the database with the schema and the filtering options.
+        The password is not part of the key, the path of a database file is absolute. """
+        url = make_url(database_uri)
+        if url.drivername.split('+')[0] == 'sqlite' and url.database not in (None, '', ':memory:'):
+            database = os.path.realpath(url.database)
+            if hasattr(url, 'set'):
+                url = url.set(database=database)
+            else:
+                # The URL of SQLAlchemy < 1.4 is mutable, and can be the one of the engine.
+                url = copy.copy(url)
+                url.database = database
+        url = repr(url)
+        document = json.dumps([CACHE_FORMAT_VERSION, url, schema, options], sort_keys=True)
+        return hashlib.sha256(document.encode('utf-8')).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + ENTRY_SUFFIX)
+
+    def load(self, key):
+        """ Returns the entry, a dict of the fingerprint, tables, relationships and tables_fingerprints, if it exists
+        and is not expired, else None. An unreadable entry is a miss. """
+        path = self.path(key)
+        try:
+            if self.ttl is not None and time.time() - os.path.getmtime(path) > self.ttl:
+                self.invalidate(key)
+                return None
+            with open(path, 'rb') as f:
+                metadata = json.loads(f.readline().decode('utf-8'))
+                tables, relationships = snapshot_loads(f.read())
+            tables_fingerprints = metadata['tables_fingerprints']
+            if tables_fingerprints is not None:
+                tables_fingerprints = dict((schema, fingerprints) for schema, fingerprints in tables_fingerprints)
+            entry = {
+                'fingerprint': metadata['fingerprint'],
+                'tables': tables,
+                'relationships': relationships,
+                'tables_fingerprints': tables_fingerprints,
+            }
+        except Exception:
+            return None
+        # The access time is the one of the last use of the entry, used by the eviction.
+        os.utime(path, (time.time(), os.path.getmtime(path)))
+        return entry
+
+    def set(self, key, fingerprint, tables, relationships, tables_fingerprints=None):
+        """ Stores the entry, then evicts the least recently used entries if the cache is too big. """
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        metadata = {
+            'fingerprint': fingerprint,
+            # A list of pairs since the default schema (None) can not be a key of a JSON object.
+            'tables_fingerprints': None if tables_fingerprints is None else list(tables_fingerprints.items()),
+        }
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(json.dumps(metadata, sort_keys=True).encode('utf-8') + b'\n')
+            f.write(snapshot_dumps(tables, relationships))
+        os.replace(tmp_path, self.path(key))
+        self.evict()
+
+    def entries(self):
+        """ Returns the (path, stat) of the entries. """
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return []
+        paths = [os.path.join(self.directory, name) for name in names if name.endswith(ENTRY_SUFFIX)]
+        return [(path, os.stat(path)) for path in paths]
+
+    def evict(self):
+        """ Removes the least recently used entries until the size of the cache is at most max_size. """
+        if self.max_size is None:
+            return
+        entries = sorted(self.entries(), key=lambda entry: entry[1].st_atime)
+        size = sum(stat.st_size for _, stat in entries)
+        for path, stat in entries:
+            if size <= self.max_size:
+                break
+            os.remove(path)
+            size -= stat.st_size
+
+    def invalidate(self, key):
+        """ Removes the entry of the key. """
+        try:
+            os.remove(self.path(key))
+        except OSError:
+            pass
+
+    def clear(self):
+        """ Removes all the entries. """
+        for path, _ in self.entries():
+            os.remove(path)
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+Columnar intermediary representation: all the columns of all the tables are stored in parallel arrays, which uses
+much less memory than one Column object per column for huge schemas.
+It is a library-only container: render_er and all_to_intermediary use the lists of Table and Relation, the
+conversions being ColumnarIntermediary.from_intermediary and to_intermediary.
+"""
+from array import array
+from itertools import compress
+
+from eralchemy.cst import TABLE_DOT_START, TABLE_DOT_LABEL_START, TABLE_DOT_HEADER, \
+    TABLE_DOT_HEADER_END, TABLE_DOT_LABEL_END, TABLE_DOT_END, COLUMN_DOT_START, COLUMN_DOT_NAME_END, \
+    COLUMN_DOT_TYPE_START, COLUMN_DOT_TYPE_END, COLUMN_DOT_END
+from eralchemy.helpers import compile_names_matcher
+from eralchemy.main import dot_chunks, markdown_chunks, relationships_neighborhood
+from eralchemy.models import Column, Table
+
+NO_TYPE = -1
+
+
+class ColumnarIntermediary:
+    """ Stores the tables and their columns in parallel arrays:
+        - tables_names[i] is the name of the table i, its columns are at the indexes
+          tables_offsets[i] to tables_offsets[i + 1] (excluded) of the columns arrays.
+        - columns_tables[j], columns_names[j], columns_types[j] and columns_is_key[j] are the index of the table, the
+          name, the index of the type in types (NO_TYPE when the type is None) and whether the column j is a key.
+    The types are interned: each distinct type is stored once in types.
+    The relationships are stored as a list of Relation.
+    """
+
+    def __init__(self):
+        self.tables_names = []
+        self.tables_offsets = array('l', [0])
+        self.columns_tables = array('l')
+        self.columns_names = []
+        self.columns_types = array('l')
+        self.columns_is_key = bytearray()
+        self.types = []
+        self.types_ids = {}
+        self.relationships = []
+
+    def __len__(self):
+        return len(self.tables_names)
+
+    def type_id(self, typ):
+        """ Returns the index of typ in types, adding it if needed. """
+        if typ is None:
+            return NO_TYPE
+        try:
+            return self.types_ids[typ]
+        except KeyError:
+            self.types_ids[typ] = len(self.types)
+            self.types.append(typ)
+            return self.types_ids[typ]
+
+    def add_table(self, name, columns):
+        """ Adds a table, columns being an iterable of (name, type, is_key). """
+        table_id = len(self.tables_names)
+        self.tables_names.append(name)
+        for column_name, typ, is_key in columns:
+            self.columns_tables.append(table_id)
+            self.columns_names.append(column_name)
+            self.columns_types.append(self.type_id(typ))
+            self.columns_is_key.append(bool(is_key))
+        self.tables_offsets.append(len(self.columns_names))
+
+    @classmethod
+    def from_intermediary(cls, tables, relationships):
+        """ Builds the columnar representation from the lists of Table and Relation. """
+        rv = cls()
+        for table in tables:
+            rv.add_table(table.name, ((c.name, c.type, c.is_key) for c in table.columns))
+        rv.relationships = list(relationships)
+        return rv
+
+    def columns_range(self, table_id):
+        return range(self.tables_offsets[table_id], self.tables_offsets[table_id + 1])
+
+    def column_type(self, column_id):
+        type_id = self.columns_types[column_id]
+        return None if type_id == NO_TYPE else self.types[type_id]
+
+    def to_intermediary(self):
+        """ Returns the lists of Table and Relation of the representation. """
+        tables = [
+            Table(
+                name=name,
+                columns=[
+                    Column(
+                        name=self.columns_names[j],
+                        type=self.column_type(j),
+                        is_key=bool(self.columns_is_key[j]),
+                    )
+                    for j in self.columns_range(i)
+                ],
+            )
+            for i, name in enumerate(self.tables_names)
+        ]
+        return tables, list(self.relationships)
+
+    def filter_resources(self, include_tables=None, include_columns=None,
+                         exclude_tables=None, exclude_columns=None,
+                         focus=None, depth=1):
+        """ Same as eralchemy.main.filter_resources, returns a new ColumnarIntermediary. """
+        if include_tables:
+            include_tables = compile_names_matcher(include_tables)
+        else:
+            include_tables = set(self.tables_names).__contains__
+        if focus:
+            focus_tables = relationships_neighborhood(self.tables_names, self.relationships, focus, depth)
+        else:
+            focus_tables = None
+
+        def include_table(name):
+            return (focus_tables is None or name in focus_tables) and include_tables(name)
+        exclude_table = compile_names_matcher(exclude_tables)
+        tables_mask = [include_table(name) and not exclude_table(name) for name in self.tables_names]
+
+        include_columns = set(include_columns) if include_columns else set(self.columns_names)
+        exclude_columns = set(exclude_columns or [])
+        columns_mask = [tables_mask[table_id] and name in include_columns and name not in exclude_columns
+                        for table_id, name in zip(self.columns_tables, self.columns_names)]
+
+        rv = ColumnarIntermediary()
+        rv.tables_names = list(compress(self.tables_names, tables_mask))
+        new_tables_ids = [None] * len(self.tables_names)
+        for new_id, table_id in enumerate(compress(range(len(self.tables_names)), tables_mask)):
+            new_tables_ids[table_id] = new_id
+        rv.columns_tables = array('l', (new_tables_ids[i] for i in compress(self.columns_tables, columns_mask)))
+        rv.columns_names = list(compress(self.columns_names, columns_mask))
+        rv.columns_types = array('l', compress(self.columns_types, columns_mask))
+        rv.columns_is_key = bytearray(compress(self.columns_is_key, columns_mask))
+        rv.types = list(self.types)
+        rv.types_ids = dict(self.types_ids)
+        counts = [0] * len(rv.tables_names)
+        for table_id in rv.columns_tables:
+            counts[table_id] += 1
+        for count in counts:
+            rv.tables_offsets.append(rv.tables_offsets[-1] + count)
+
+        rv.relationships = [r for r in self.relationships
+                            if include_table(r.right_col) and not exclude_table(r.right_col)
+                            and include_table(r.left_col) and not exclude_table(r.left_col)]
+        return rv
+
+    def _table_dot(self, table_id, types_dot):
+        """ Returns the dot source of the table, with a single join over the fragments of its columns. """
+        name = self.tables_names[table_id]
+        fragments = [TABLE_DOT_START, name, TABLE_DOT_LABEL_START, TABLE_DOT_HEADER, name, TABLE_DOT_HEADER_END]
+        for j in self.columns_range(table_id):
+            is_key = self.columns_is_key[j]
+            fragments += (COLUMN_DOT_START[is_key], self.columns_names[j], COLUMN_DOT_NAME_END[is_key],
+                          types_dot[self.columns_types[j]])
+        fragments += (TABLE_DOT_LABEL_END, TABLE_DOT_END)
+        return ''.join(fragments)
+
+    def to_dot(self):
+        """ Returns the dot source of the tables and of the relationships, same as
+        eralchemy.main._intermediary_to_dot. """
+        # The end of the rows is formatted once per type, the last element is the one of NO_TYPE.
+        types_dot = [COLUMN_DOT_TYPE_START + typ + COLUMN_DOT_TYPE_END + COLUMN_DOT_END for typ in self.types]
+        types_dot.append(COLUMN_DOT_END)
+        tables_dot = (self._table_dot(i, types_dot) for i in range(len(self.tables_names)))
+        return ''.join(dot_chunks(tables_dot, (r.to_dot() for r in self.relationships)))
+
+    def to_markdown(self):
+        """ Returns the er markup of the tables and of the relationships, same as
+        eralchemy.main._intermediary_to_markdown. """
+        # The last element is the one of NO_TYPE.
+        types_markdown = [' {{label:"{}"}}'.format(typ) for typ in self.types + [None]]
+        columns_markdown = [
+            '    {}{}{}'.format('*' if is_key else '', name, types_markdown[type_id])
+            for name, type_id, is_key in zip(self.columns_names, self.columns_types, self.columns_is_key)
+        ]
+        tables_markdown = (
+            '[{}]\n'.format(name) + '\n'.join(columns_markdown[start:end])
+            for name, start, end in zip(self.tables_names, self.tables_offsets, self.tables_offsets[1:])
+        )
+        return ''.join(markdown_chunks(tables_markdown, (r.to_markdown() for r in self.relationships)))
@@ -10,6 +10,19 @@ START_CELL = '<TR><TD ALIGN="LEFT"><FONT>'
 FONT_TAGS = '<FONT>{}</FONT>'
 # Used for each row in the table.
 ROW_TAGS = '<TR><TD{}>{}</TD></TR>'
+# Fragments of the dot label of the tables, joined once per table. The column ones are indexed by is_key.
+TABLE_DOT_START = '"'
+TABLE_DOT_LABEL_START = '" [label=<'
+TABLE_DOT_HEADER = '<FONT FACE="Helvetica"><TABLE BORDER="0" CELLBORDER="1" CELLPADDING="4"' \
+                   ' CELLSPACING="0"><TR><TD><B><FONT POINT-SIZE="16">'
+TABLE_DOT_HEADER_END = '</FONT></B></TD></TR>'
+TABLE_DOT_LABEL_END = '</TABLE></FONT>'
+TABLE_DOT_END = '>];'
+COLUMN_DOT_START = ('<TR><TD ALIGN="LEFT"><FONT>', '<TR><TD ALIGN="LEFT"><u><FONT>')
+COLUMN_DOT_NAME_END = ('</FONT>', '</FONT></u>')
+COLUMN_DOT_TYPE_START = '<FONT> ['
+COLUMN_DOT_TYPE_END = ']</FONT>'
+COLUMN_DOT_END = '</TD></TR>'
 GRAPH_BEGINNING = (' graph {\n'
                    '    graph [rankdir=LR];\n'
                    '    node [label=\"\\N\",\n'
@@ -20,3 +33,14 @@ GRAPH_BEGINNING = (' graph {\n'
                    '        style=dashed\n'
                    '    ];\n'
                    )
+# Graph attributes added to GRAPH_BEGINNING for each layout engine (rankdir and minlen are only used by dot): the
+# force-directed engines remove the overlaps of the nodes, sfdp (for huge graphs) draws straight edges as routing the
+# splines around the nodes is slow.
+LAYOUT_ENGINES_ATTRIBUTES = {
+    'dot': {},
+    'neato': {'overlap': 'false', 'splines': 'true'},
+    'fdp': {'overlap': 'false', 'splines': 'true'},
+    'sfdp': {'overlap': 'scale', 'splines': 'false'},
+}
+# Number of tables above which the 'auto' layout engine is sfdp instead of dot.
+AUTO_LAYOUT_MAX_DOT_TABLES = 500
@@ -33,7 +33,7 @@ def table_to_intermediary(table):
 
 def column_to_intermediary(column, type_formatter=format_type):
     return Column(
-        name=column.name,
+        name=format_name(column.name),
         type=type_formatter(column.type),
         is_key=column.pk,
     )
@@ -1,6 +1,12 @@
 from __future__ import print_function
+import collections
+import fnmatch
+import re
 import sys
 
+REGEX_PREFIX = 're:'
+GLOB_CHARACTERS = '*?['
+
 
 # from https://github.com/mitsuhiko/flask/blob/master/scripts/make-release.py L92
 def fail(message, *args):
@@ -31,8 +37,69 @@ def check_args_has_attributes(args):
     check_args_has_attribute(args, 'exclude_tables')
     check_args_has_attribute(args, 'exclude_columns')
     check_args_has_attribute(args, 's')
+    check_args_has_attribute(args, 'focus')
+    check_args_has_attribute(args, 'depth')
+    check_args_has_attribute(args, 'cache_dir')
+    check_args_has_attribute(args, 'cache_ttl')
+    check_args_has_attribute(args, 'cache_max_size')
+    check_args_has_attribute(args, 'clear_cache')
+    check_args_has_attribute(args, 'incremental')
+    check_args_has_attribute(args, 'prog')
 
 
 def check_args_has_attribute(args, name):
     if not hasattr(args, name):
         raise Exception('{} should be set'.format(name))
+
+
+def compile_names_matcher(patterns):
+    """ Compiles a list of patterns into a single function telling if a name matches any of them.
+    A pattern is either:
+        - a regular expression prefixed by 're:' (e.g. 're:audit_[0-9]+'), which has to match the whole name,
+        - a glob if it contains one of '*?[' (e.g. 'schema.*', 'tmp_*'),
+        - the exact name otherwise.
+    The exact names are looked up in a set, the other patterns are combined in a single regular expression.
+    """
+    names = set()
+    regexes = []
+    for pattern in patterns or []:
+        if pattern.startswith(REGEX_PREFIX):
+            regexes.append(pattern[len(REGEX_PREFIX):])
+        elif any(c in pattern for c in GLOB_CHARACTERS):
+            regexes.append(fnmatch.translate(pattern))
+        else:
+            names.add(pattern)
+    if len(regexes) == 0:
+        return names.__contains__
+
+    regex = re.compile('|'.join('(?:{})'.format(r) for r in regexes))
+
+    def match(name):
+        return name in names or regex.fullmatch(name) is not None
+    return match
+
+
+def build_adjacency(edges):
+    """ Returns the adjacency index of the undirected graph of the edges (pairs of names): name -> set of names. """
+    adjacency = collections.defaultdict(set)
+    for left, right in edges:
+        adjacency[left].add(right)
+        adjacency[right].add(left)
+    return adjacency
+
+
+def neighborhood(adjacency, seeds, depth):
+    """ Returns the set of the names at most depth edges away from one of the seeds (breadth first search). """
+    visited = set(seeds)
+    frontier = visited
+    for _ in range(depth):
+        frontier = set(n for name in frontier for n in adjacency.get(name, ())) - visited
+        if len(frontier) == 0:
+            break
+        visited |= frontier
+    return visited
+
+
+def qualified_name(schema, name):
+    """ Returns the name of the table as in Table.fullname. """
+    return name if schema is None else '{}.{}'.format(schema, name)
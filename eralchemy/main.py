@@ -1,18 +1,21 @@
 # -*- coding: utf-8 -*-
 import argparse
 import sys
-import copy
 
 from pygraphviz.agraph import AGraph
 from sqlalchemy.engine.url import make_url
 from sqlalchemy.exc import ArgumentError
 
 from eralchemy.version import version as __version__
-from eralchemy.cst import GRAPH_BEGINNING
+from eralchemy.cache import ReflectionCache, DEFAULT_TTL, DEFAULT_MAX_SIZE
+from eralchemy.cst import GRAPH_BEGINNING, LAYOUT_ENGINES_ATTRIBUTES, AUTO_LAYOUT_MAX_DOT_TABLES
 from eralchemy.dbml import dbml_file_to_intermediary
-from eralchemy.sqla import metadata_to_intermediary, declarative_to_intermediary, database_to_intermediary
-from eralchemy.helpers import check_args
+from eralchemy.sqla import metadata_to_intermediary, declarative_to_intermediary, database_to_intermediary, \
+    bind_to_intermediary
+from eralchemy.helpers import check_args, compile_names_matcher, build_adjacency, neighborhood
+from eralchemy.models import Table
 from eralchemy.parser import markdown_file_to_intermediary, line_iterator_to_intermediary, ParsingException
+from eralchemy.snapshot import intermediary_to_snapshot, snapshot_file_to_intermediary
 
 try:
     basestring
@@ -29,65 +32,180 @@ def cli():
     if args.v:
         print('ERAlchemy version {}.'.format(__version__))
         exit(0)
+    cache = ReflectionCache(
+        args.cache_dir,
+        ttl=args.cache_ttl if args.cache_ttl is not None else DEFAULT_TTL,
+        max_size=args.cache_max_size * 2 ** 20 if args.cache_max_size is not None else DEFAULT_MAX_SIZE,
+        incremental=bool(args.incremental),
+    )
+    if args.clear_cache:
+        # Empties the default cache directory too when there is no --cache-dir.
+        cache.clear()
+    if args.cache_dir is None and not args.incremental:
+        cache = None
     render_er(
-        args.i,
+        sys.stdin if args.i == '-' else args.i,
         args.o,
         include_tables=args.include_tables,
         include_columns=args.include_columns,
         exclude_tables=args.exclude_tables,
         exclude_columns=args.exclude_columns,
-        schema=args.s
+        schema=args.s,
+        focus=args.focus,
+        depth=args.depth if args.depth is not None else 1,
+        cache=cache,
+        prog=args.prog if args.prog is not None else 'dot',
     )
 
 
 def get_argparser():
     parser = argparse.ArgumentParser(prog='ERAlchemy')
-    parser.add_argument('-i', nargs='?', help='Database URI to process.')
-    parser.add_argument('-o', nargs='?', help='Name of the file to write.')
-    parser.add_argument('-s', nargs='?', help='Name of the schema.')
-    parser.add_argument('--exclude-tables', '-x', nargs='+', help='Name of tables not to be displayed.')
+    parser.add_argument('-i', nargs='?', help='Database URI to process (- to read er markup from stdin).')
+    parser.add_argument('-o', nargs='+',
+                        help='Name of the file to write, or names of the files written from a single layout.')
+    parser.add_argument('-s', nargs='+', help='Name of the schema, or names of the schemas drawn together.')
+    parser.add_argument('--exclude-tables', '-x', nargs='+',
+                        help='Name or pattern (glob such as schema.*, or re:regex) of tables not to be displayed.')
     parser.add_argument('--exclude-columns', nargs='+', help='Name of columns not to be displayed (for all tables).')
-    parser.add_argument('--include-tables', nargs='+', help='Name of tables to be displayed alone.')
+    parser.add_argument('--include-tables', nargs='+',
+                        help='Name or pattern (glob such as schema.*, or re:regex) of tables to be displayed alone.')
     parser.add_argument('--include-columns', nargs='+', help='Name of columns to be displayed alone (for all tables).')
+    parser.add_argument('--focus', nargs='+',
+                        help='Name or pattern of tables to be displayed with their neighbors alone.')
+    parser.add_argument('--depth', type=int,
+                        help='Number of foreign keys hops around the --focus tables to display (default 1).')
+    parser.add_argument('--cache-dir',
+                        help='Directory of the cache of the reflected databases, reused while the schema is unchanged.')
+    parser.add_argument('--cache-ttl', type=float,
+                        help='Seconds after which a cached reflection expires (default 1 week).')
+    parser.add_argument('--cache-max-size', type=float,
+                        help='Size of the cache in MiB above which the least recently used entries are evicted '
+                             '(default 100).')
+    parser.add_argument('--clear-cache', action='store_const', const=True,
+                        help='Empties the cache before rendering (the one of --cache-dir, else ~/.cache/eralchemy).')
+    parser.add_argument('--incremental', action='store_const', const=True,
+                        help='Reflects again only the tables which changed since the cached reflection (uses the '
+                             'cache, in ~/.cache/eralchemy without --cache-dir).')
+    parser.add_argument('--prog', choices=sorted(LAYOUT_ENGINES_ATTRIBUTES) + ['auto'],
+                        help='Graphviz layout engine of the images (default dot), auto uses sfdp above {} '
+                             'tables.'.format(AUTO_LAYOUT_MAX_DOT_TABLES))
     parser.add_argument('-v', help='Prints version number.', action='store_true')
     return parser
 
 
 def intermediary_to_markdown(tables, relationships, output):
-    """ Saves the intermediary representation to markdown. """
-    er_markup = _intermediary_to_markdown(tables, relationships)
-    with open(output, "w") as file_out:
-        file_out.write(er_markup)
+    """ Saves the intermediary representation to markdown, output being a filename or a stream. """
+    _write_chunks(_intermediary_to_markdown_chunks(tables, relationships), output)
 
 
 def intermediary_to_dot(tables, relationships, output):
-    """ Save the intermediary representation to dot format. """
-    dot_file = _intermediary_to_dot(tables, relationships)
-    with open(output, "w") as file_out:
-        file_out.write(dot_file)
+    """ Save the intermediary representation to dot format, output being a filename or a stream. """
+    _write_chunks(_intermediary_to_dot_chunks(tables, relationships), output)
 
 
-def intermediary_to_schema(tables, relationships, output):
-    """ Transforms and save the intermediary representation to the file chosen. """
-    dot_file = _intermediary_to_dot(tables, relationships)
-    graph = AGraph()
-    graph = graph.from_string(dot_file)
+def _write_chunks(chunks, output):
+    """ Writes the chunks one after the other to output (a filename or a stream), without joining them. """
+    if hasattr(output, 'write'):
+        output.writelines(chunks)
+        return
+    with open(output, "w") as file_out:
+        file_out.writelines(chunks)
+
+
+def get_layout_engine(prog, tables):
+    """ Returns the graphviz layout engine from prog, one of LAYOUT_ENGINES_ATTRIBUTES or 'auto' which chooses dot or
+    sfdp from the number of tables. """
+    if prog == 'auto':
+        return 'dot' if len(tables) <= AUTO_LAYOUT_MAX_DOT_TABLES else 'sfdp'
+    if prog not in LAYOUT_ENGINES_ATTRIBUTES:
+        raise ValueError('Layout engine "{}" is not supported.'.format(prog))
+    return prog
+
+
+def intermediary_to_graph(tables, relationships, prog='dot'):
+    """ Returns the AGraph of the intermediary representation, the same graph as the one of the dot source of
+    _intermediary_to_dot with the attributes of the layout engine prog. Only the skeleton of the graph (the names of
+    the tables and the relations) is parsed by graphviz, the labels of the tables are set directly on the nodes. """
+    skeleton = '{}\n{}\n{}\n}}'.format(
+        GRAPH_BEGINNING,
+        # The nodes are declared before the edges, in the same order as in the dot source.
+        '\n'.join('"{}";'.format(t.name) for t in tables),
+        # pygraphviz only sets HTML values to the label attributes, the cardinalities of the edges are parsed.
+        '\n'.join(r.to_dot() for r in relationships),
+    )
+    graph = AGraph().from_string(skeleton)
+    graph.graph_attr.update(LAYOUT_ENGINES_ATTRIBUTES[prog])
+    for table in tables:
+        graph.get_node(table.name).attr['label'] = table.label_dot
+    return graph
+
+
+def intermediary_to_schema(tables, relationships, output, prog='dot'):
+    """ Transforms and save the intermediary representation to the file chosen, laid out by prog (see
+    get_layout_engine). """
+    prog = get_layout_engine(prog, tables)
+    graph = intermediary_to_graph(tables, relationships, prog)
     extension = output.split('.')[-1]
-    graph.draw(path=output, prog='dot', format=extension)
+    graph.draw(path=output, prog=prog, format=extension)
+
+
+def intermediary_to_schemas(tables, relationships, outputs, prog='dot'):
+    """ Transforms and save the intermediary representation to the image files chosen (lst of str), the layout of
+    the graph being computed once for all of them. """
+    prog = get_layout_engine(prog, tables)
+    graph = intermediary_to_graph(tables, relationships, prog)
+    graph.layout(prog=prog)
+    for output in outputs:
+        graph.draw(path=output, format=output.split('.')[-1])
+
+
+def _joined(strings, separator='\n'):
+    """ Yields the strings and the separators between them, the chunks of separator.join(strings). """
+    for i, string in enumerate(strings):
+        if i:
+            yield separator
+        yield string
+
+
+def markdown_chunks(tables_markdown, relationships_markdown):
+    """ Yields the chunks of the er markup source from the er markup of each table and of each relation. """
+    for chunk in _joined(tables_markdown):
+        yield chunk
+    yield '\n'
+    for chunk in _joined(relationships_markdown):
+        yield chunk
+
+
+def dot_chunks(tables_dot, relationships_dot):
+    """ Yields the chunks of the dot source from the dot of each table and of each relation. """
+    yield GRAPH_BEGINNING
+    yield '\n'
+    for chunk in _joined(tables_dot):
+        yield chunk
+    yield '\n'
+    for chunk in _joined(relationships_dot):
+        yield chunk
+    yield '\n}'
+
+
+def _intermediary_to_markdown_chunks(tables, relationships):
+    """ Yields the chunks of the er markup source, table by table and relation by relation. """
+    return markdown_chunks((t.to_markdown() for t in tables), (r.to_markdown() for r in relationships))
+
+
+def _intermediary_to_dot_chunks(tables, relationships):
+    """ Yields the chunks of the dot source, table by table and relation by relation. """
+    return dot_chunks((t.to_dot() for t in tables), (r.to_dot() for r in relationships))
 
 
 def _intermediary_to_markdown(tables, relationships):
     """ Returns the er markup source in a string. """
-    t = '\n'.join(t.to_markdown() for t in tables)
-    r = '\n'.join(r.to_markdown() for r in relationships)
-    return '{}\n{}'.format(t, r)
+    return ''.join(_intermediary_to_markdown_chunks(tables, relationships))
 
 
 def _intermediary_to_dot(tables, relationships):
     """ Returns the dot source representing the database in a string. """
-    t = '\n'.join(t.to_dot() for t in tables)
-    r = '\n'.join(r.to_dot() for r in relationships)
-    return '{}\n{}\n{}\n}}'.format(GRAPH_BEGINNING, t, r)
+    return ''.join(_intermediary_to_dot_chunks(tables, relationships))
 
 
 # Routes from the class name to the function transforming this class in
@@ -98,15 +216,24 @@ switch_input_class_to_method = {
     # For compatibility with Flask-SQLAlchemy
     '_BoundDeclarativeMeta': declarative_to_intermediary,
     # Renamed in Flask-SQLAlchemy 2.3
-    'DefaultMeta': declarative_to_intermediary
+    'DefaultMeta': declarative_to_intermediary,
+    # Engine and connection of the caller, reused and left open.
+    'Engine': bind_to_intermediary,
+    # Returned by Engine.execution_options.
+    'OptionEngine': bind_to_intermediary,
+    'Connection': bind_to_intermediary,
 }
 
+# Names of the classes of switch_input_class_to_method which are reflected, with the schema and the filtering options.
+reflected_input_classes = {'Engine', 'OptionEngine', 'Connection'}
+
 # Routes from the mode to the method to transform the intermediary
 #  representation to the desired output.
 switch_output_mode_auto = {
     'er': intermediary_to_markdown,
     'graph': intermediary_to_schema,
-    'dot': intermediary_to_dot
+    'dot': intermediary_to_dot,
+    'erbin': intermediary_to_snapshot,
 }
 
 # Routes from the file extension to the method to transform
@@ -114,23 +241,31 @@ switch_output_mode_auto = {
 switch_output_mode = {
     'er': intermediary_to_markdown,
     'dot': intermediary_to_dot,
+    'erbin': intermediary_to_snapshot,
 }
 
 
-def all_to_intermediary(filename_or_input, schema=None):
+def all_to_intermediary(filename_or_input, schema=None, include_tables=None, exclude_tables=None, focus=None,
+                        depth=1, cache=None):
     """ Dispatch the filename_or_input to the different function to produce the intermediary syntax.
     All the supported classes names are in `swich_input_class_to_method`.
-    The input can also be a list of strings in markdown format or a filename finishing by '.er' containing markdown
-    format.
+    The input can also be a list of strings in markdown format, a filename finishing by '.er' containing markdown
+    format, a filename finishing by '.erbin' containing a binary snapshot (see eralchemy.snapshot) or a stream (an
+    object with a `read` method) of markdown format.
+    When reflecting a database, include_tables, exclude_tables, focus and depth (see filter_resources) restrict the
+    tables which are reflected, and the reflection is stored in the cache (eralchemy.cache.ReflectionCache) if any.
     """
     # Try to convert from the name of the class
     input_class_name = filename_or_input.__class__.__name__
     try:
         this_to_intermediary = switch_input_class_to_method[input_class_name]
-        tables, relationships = this_to_intermediary(filename_or_input)
-        return tables, relationships
     except KeyError:
         pass
+    else:
+        if input_class_name in reflected_input_classes:
+            return this_to_intermediary(filename_or_input, schema=schema, include_tables=include_tables,
+                                        exclude_tables=exclude_tables, focus=focus, depth=depth, cache=cache)
+        return this_to_intermediary(filename_or_input)
 
     # try read dbml file
     if isinstance(filename_or_input, basestring):
@@ -142,6 +277,15 @@ def all_to_intermediary(filename_or_input, schema=None):
         if filename_or_input.split('.')[-1] == 'er':
             return markdown_file_to_intermediary(filename_or_input)
 
+    # try to read a binary snapshot.
+    if isinstance(filename_or_input, basestring):
+        if filename_or_input.split('.')[-1] == 'erbin':
+            return snapshot_file_to_intermediary(filename_or_input)
+
+    # try to read markdown from a stream, line by line.
+    if hasattr(filename_or_input, 'read'):
+        return markdown_file_to_intermediary(filename_or_input)
+
     # try to read a markdown in a string
     if not isinstance(filename_or_input, basestring):
         if all(isinstance(e, basestring) for e in filename_or_input):
@@ -150,7 +294,9 @@ def all_to_intermediary(filename_or_input, schema=None):
     # try to read DB URI.
     try:
         make_url(filename_or_input)
-        return database_to_intermediary(filename_or_input, schema=schema)
+        return database_to_intermediary(filename_or_input, schema=schema,
+                                        include_tables=include_tables, exclude_tables=exclude_tables,
+                                        focus=focus, depth=depth, cache=cache)
     except ArgumentError:
         pass
 
@@ -176,70 +322,138 @@ def get_output_mode(output, mode):
         return intermediary_to_schema
 
 
+def relationships_neighborhood(tables_names, relationships, focus, depth=1):
+    """ Returns the names of the tables (among tables_names) matching the focus (lst of str, tables names or patterns)
+    and of the tables at most depth relationships away from them. """
+    focus_table = compile_names_matcher(focus)
+    adjacency = build_adjacency((r.left_col, r.right_col) for r in relationships)
+    return neighborhood(adjacency, [name for name in tables_names if focus_table(name)], depth)
+
+
 def filter_resources(tables, relationships,
                      include_tables=None, include_columns=None,
-                     exclude_tables=None, exclude_columns=None):
+                     exclude_tables=None, exclude_columns=None,
+                     focus=None, depth=1):
     """
     Include the following:
-        1. Tables and relationships with tables present in the include_tables (lst of str, tables names)
+        1. Tables and relationships with tables matching the include_tables (lst of str, tables names or patterns)
         2. Columns (of whichever table) present in the include_columns (lst of str, columns names)
     Exclude the following:
-        1. Tables and relationships with tables present in the exclude_tables (lst of str, tables names)
+        1. Tables and relationships with tables matching the exclude_tables (lst of str, tables names or patterns)
         2. Columns (of whichever table) present in the exclude_columns (lst of str, columns names)
+    If focus (lst of str, tables names or patterns) is given, only the tables at most depth relationships away from
+    the focused tables are included, see relationships_neighborhood.
+    The tables patterns are described in eralchemy.helpers.compile_names_matcher.
     Disclosure note:
         All relationships are taken into consideration before ignoring columns.
         In other words, if one excludes primary or foreign keys, it will still keep the relations display amongst tables
+    Copy note:
+        The input is not copied: the tables whose columns are filtered are new Table objects, all the other objects are
+        shared with the input.
     """
-    _tables = copy.deepcopy(tables)
-    _relationships = copy.deepcopy(relationships)
+    if include_tables:
+        include_table = compile_names_matcher(include_tables)
+    else:
+        include_table = set(t.name for t in tables).__contains__
+    if focus:
+        focus_tables = relationships_neighborhood((t.name for t in tables), relationships, focus, depth)
+        include_table = _restrict_to(focus_tables, include_table)
+    exclude_table = compile_names_matcher(exclude_tables)
+    include_columns = set(include_columns) if include_columns else None
+    exclude_columns = set(exclude_columns or [])
+
+    _tables = [t for t in tables if not exclude_table(t.name) and include_table(t.name)]
+    _relationships = [r for r in relationships
+                      if not exclude_table(r.right_col)
+                      and not exclude_table(r.left_col)
+                      and include_table(r.right_col)
+                      and include_table(r.left_col)]
+
+    if include_columns is not None or exclude_columns:
+        def keep_column(name):
+            return name not in exclude_columns and (include_columns is None or name in include_columns)
+        _tables = [_filter_columns(t, keep_column) for t in _tables]
 
-    include_tables = include_tables or [t.name for t in _tables]
-    include_columns = include_columns or [c.name for t in _tables for c in t.columns]
-    exclude_tables = exclude_tables or list()
-    exclude_columns = exclude_columns or list()
-
-    _tables = [t for t in _tables if t.name not in exclude_tables and t.name in include_tables]
-    _relationships = [r for r in _relationships
-                      if r.right_col not in exclude_tables
-                      and r.left_col not in exclude_tables
-                      and r.right_col in include_tables
-                      and r.left_col in include_tables]
+    return _tables, _relationships
 
-    for t in _tables:
-        t.columns = [c for c in t.columns if c.name not in exclude_columns and c.name in include_columns]
 
-    return _tables, _relationships
+def _restrict_to(names, match):
+    """ Returns a function telling if a name is in names and matches match. """
+    def restricted_match(name):
+        return name in names and match(name)
+    return restricted_match
+
+
+def _filter_columns(table, keep_column):
+    """ Returns table if all its columns are kept, else a new Table with the kept columns. """
+    columns = [c for c in table.columns if keep_column(c.name)]
+    if len(columns) == len(table.columns):
+        return table
+    return Table(name=table.name, columns=columns)
+
+
+def render_intermediary(tables, relationships, output, mode='auto', include_tables=None, include_columns=None,
+                        exclude_tables=None, exclude_columns=None, focus=None, depth=1, prog='dot'):
+    """ Filters the intermediary representation and writes it to the output (or the outputs), see render_er for the
+    parameters. """
+    tables, relationships = filter_resources(tables, relationships,
+                                             include_tables=include_tables, include_columns=include_columns,
+                                             exclude_tables=exclude_tables, exclude_columns=exclude_columns,
+                                             focus=focus, depth=depth)
+    outputs = output if isinstance(output, (list, tuple)) else [output]
+    graph_outputs = []
+    for output in outputs:
+        intermediary_to_output = get_output_mode(output, mode)
+        if intermediary_to_output is intermediary_to_schema:
+            graph_outputs.append(output)
+        else:
+            intermediary_to_output(tables, relationships, output)
+    if len(graph_outputs) == 1:
+        intermediary_to_schema(tables, relationships, graph_outputs[0], prog=prog)
+    elif graph_outputs:
+        intermediary_to_schemas(tables, relationships, graph_outputs, prog=prog)
 
 
 def render_er(input, output, mode='auto', include_tables=None, include_columns=None,
-              exclude_tables=None, exclude_columns=None, schema=None):
+              exclude_tables=None, exclude_columns=None, schema=None, focus=None, depth=1, cache=None, prog='dot'):
     """
     Transform the metadata into a representation.
     :param input: Possible inputs are instances of:
         MetaData: SQLAlchemy Metadata
         DeclarativeMeta: SQLAlchemy declarative Base
-    :param output: name of the file to output the
+        Engine, Connection: SQLAlchemy engine or connection of the database to reflect, left open
+        file object: stream of er markup (sys.stdin, gzip.open(filename, 'rt'), ...)
+    :param output: name of the file to output the diagram to, or lst of str, names of the files written from a
+        single reading of the input (the images sharing a single layout of the graph)
     :param mode: str in list:
         'er': writes to a file the markup to generate an ER style diagram.
         'graph': writes the image of the ER diagram.
         'dot': write to file the diagram in dot format.
+        'erbin': writes to a file the binary snapshot of the intermediary representation.
         'auto': choose from the filename:
             '*.er': writes to a file the markup to generate an ER style diagram.
             '.dot': returns the graph in the dot syntax.
+            '.erbin': writes the binary snapshot.
             else: return a graph to the format graph
-    :param include_tables: lst of str, table names to include, None means include all
+    :param include_tables: lst of str, table names or patterns to include, None means include all
     :param include_columns: lst of str, column names to include, None means include all
-    :param exclude_tables: lst of str, table names to exclude, None means exclude nothing
+    :param exclude_tables: lst of str, table names or patterns to exclude, None means exclude nothing
     :param exclude_columns: lst of str, field names to exclude, None means exclude nothing
-    :param schema: name of the schema
+    :param schema: name of the schema, or lst of str, names of the schemas reflected concurrently and drawn together
+    :param focus: lst of str, table names or patterns to display with their neighbors alone, None means all tables
+    :param depth: int, number of relationships hops around the focus tables to display
+    :param cache: eralchemy.cache.ReflectionCache, cache of the reflected databases, None means no cache
+    :param prog: str, graphviz layout engine of the images: 'dot', 'neato', 'fdp', 'sfdp' or 'auto' (dot, or sfdp
+        for more than AUTO_LAYOUT_MAX_DOT_TABLES tables)
     """
     try:
-        tables, relationships = all_to_intermediary(input, schema=schema)
-        tables, relationships = filter_resources(tables, relationships,
-                                                 include_tables=include_tables, include_columns=include_columns,
-                                                 exclude_tables=exclude_tables, exclude_columns=exclude_columns)
-        intermediary_to_output = get_output_mode(output, mode)
-        intermediary_to_output(tables, relationships, output)
+        tables, relationships = all_to_intermediary(input, schema=schema,
+                                                    include_tables=include_tables, exclude_tables=exclude_tables,
+                                                    focus=focus, depth=depth, cache=cache)
+        render_intermediary(tables, relationships, output, mode=mode,
+                            include_tables=include_tables, include_columns=include_columns,
+                            exclude_tables=exclude_tables, exclude_columns=exclude_columns,
+                            focus=focus, depth=depth, prog=prog)
     except ImportError as e:
         module_name = e.message.split()[-1]
         print('Please install {0} using "pip install {0}".'.format(module_name))
@@ -1,5 +1,7 @@
 # -*- coding: utf-8 -*-
-from eralchemy.cst import TABLE, FONT_TAGS, ROW_TAGS
+from eralchemy.cst import ROW_TAGS, TABLE_DOT_START, TABLE_DOT_LABEL_START, TABLE_DOT_HEADER, TABLE_DOT_HEADER_END, \
+    TABLE_DOT_LABEL_END, TABLE_DOT_END, COLUMN_DOT_START, COLUMN_DOT_NAME_END, COLUMN_DOT_TYPE_START, \
+    COLUMN_DOT_TYPE_END, COLUMN_DOT_END
 import operator
 import re
 
@@ -10,7 +12,10 @@ We can several kinds of models can be translated to this syntax.
 
 
 class Drawable:
-    """ Abstract class to represent all the objects which are drawable."""
+    """ Abstract class to represent all the objects which are drawable.
+    The attributes of the objects are declared in the `__slots__` of their classes, which are compared by __eq__.
+    """
+    __slots__ = ()
     RE = None
 
     def to_markdown(self):
@@ -22,7 +27,11 @@ class Drawable:
         raise NotImplemented()
 
     def __eq__(self, other):
-        return self.__dict__ == other.__dict__
+        if type(self) is not type(other):
+            return False
+        # The subclasses of the models keep their attributes with empty __slots__.
+        return all(getattr(self, name) == getattr(other, name)
+                   for cls in type(self).__mro__ for name in getattr(cls, '__slots__', ()))
 
     @staticmethod
     def make_from_match(self):
@@ -35,6 +44,7 @@ class Drawable:
 
 class Column(Drawable):
     """ Represents a Column in the intermediaty syntax """
+    __slots__ = ('name', 'type', 'is_key')
     RE = re.compile('(?P<primary>\*?)(?P<name>[^\s]+)\s*(\{label:\s*"(?P<label>[^"]+)"\})?')
 
     @staticmethod
@@ -63,18 +73,21 @@ class Column(Drawable):
     def to_markdown(self):
         return '    {}{} {{label:"{}"}}'.format(self.key_symbol, self.name, self.type)
 
+    def dot_fragments(self):
+        """ Returns the fragments of the dot row of the column, to be joined with the ones of the table. """
+        is_key = bool(self.is_key)
+        if self.type is None:
+            return COLUMN_DOT_START[is_key], self.name, COLUMN_DOT_NAME_END[is_key], COLUMN_DOT_END
+        return (COLUMN_DOT_START[is_key], self.name, COLUMN_DOT_NAME_END[is_key],
+                COLUMN_DOT_TYPE_START, self.type, COLUMN_DOT_TYPE_END, COLUMN_DOT_END)
+
     def to_dot(self):
-        base = ROW_TAGS.format(' ALIGN="LEFT"', '{key_opening}{col_name}{key_closing}{type}')
-        return base.format(
-            key_opening='<u>' if self.is_key else '',
-            key_closing='</u>' if self.is_key else '',
-            col_name=FONT_TAGS.format(self.name),
-            type=FONT_TAGS.format(' [{}]').format(self.type) if self.type is not None else ''
-        )
+        return ''.join(self.dot_fragments())
 
 
 class Relation(Drawable):
     """ Represents a Relation in the intermediaty syntax """
+    __slots__ = ('right_col', 'left_col', 'right_cardinality', 'left_cardinality')
     RE = re.compile(
         '(?P<left_name>[^\s]+)\s*(?P<left_cardinality>[*?+1])--(?P<right_cardinality>[*?+1])\s*(?P<right_name>[^\s]+)')  # noqa: E501
     cardinalities = {
@@ -95,8 +108,8 @@ class Relation(Drawable):
         )
 
     def __init__(self, right_col, left_col, right_cardinality=None, left_cardinality=None):
-        if right_cardinality not in self.cardinalities.keys() \
-                or left_cardinality not in self.cardinalities.keys():
+        if right_cardinality not in self.cardinalities \
+                or left_cardinality not in self.cardinalities:
             raise ValueError('Cardinality should be in {}"'.format(self.cardinalities.keys()))
         self.right_col = right_col
         self.left_col = left_col
@@ -137,11 +150,12 @@ class Relation(Drawable):
             right_cardinality=other.left_cardinality,
             left_cardinality=other.right_cardinality,
         )
-        return other_inversed.__dict__ == self.__dict__
+        return Drawable.__eq__(self, other_inversed)
 
 
 class Table(Drawable):
     """ Represents a Table in the intermediaty syntax """
+    __slots__ = ('name', 'columns')
     RE = re.compile('\[(?P<name>[^]]+)\]')
 
     def __init__(self, name, columns):
@@ -170,9 +184,25 @@ class Table(Drawable):
     def header_dot(self):
         return ROW_TAGS.format('', '<B><FONT POINT-SIZE="16">{}</FONT></B>').format(self.name)
 
+    def _extend_label_dot(self, fragments):
+        """ Appends the fragments of the HTML label of the table (without the enclosing <>) to fragments. """
+        fragments += (TABLE_DOT_HEADER, self.name, TABLE_DOT_HEADER_END)
+        for column in self.columns:
+            fragments.extend(column.dot_fragments())
+        fragments.append(TABLE_DOT_LABEL_END)
+        return fragments
+
+    @property
+    def label_dot(self):
+        """ The label of the node of the table, an HTML label as understood by pygraphviz. """
+        fragments = self._extend_label_dot(['<'])
+        fragments.append('>')
+        return ''.join(fragments)
+
     def to_dot(self):
-        body = ''.join(c.to_dot() for c in self.columns)
-        return TABLE.format(self.name, self.header_dot, body)
+        fragments = self._extend_label_dot([TABLE_DOT_START, self.name, TABLE_DOT_LABEL_START])
+        fragments.append(TABLE_DOT_END)
+        return ''.join(fragments)
 
     def __str__(self):
         return self.header_markdown
@@ -1,6 +1,35 @@
 # -*- coding: utf-8 -*-
+import collections
+import io
+import mmap
+import multiprocessing
+import os
+import re
+
 from eralchemy.models import Table, Relation, Column
 
+# Classifies a line and extracts its fields in a single match. The alternatives are tried in the same order as the
+# `RE` of the models: a table, then a relation, then a column. The lookahead only skips the relation alternative
+# early for the lines which cannot be one.
+LINE_RE = re.compile(
+    r'(?P<table>\[(?P<table_name>[^]]+)\])'
+    r'|(?=.*--)(?P<relation>(?P<left_name>[^\s]+)\s*(?P<left_cardinality>[*?+1])--'
+    r'(?P<right_cardinality>[*?+1])\s*(?P<right_name>[^\s]+))'
+    r'|(?P<column>(?P<primary>\*?)(?P<column_name>[^\s]+)\s*(?:\{label:\s*"(?P<label>[^"]+)"\})?)'
+)
+# Matches a whole line of a buffer (comment and end of line included), to iterate over the lines of a memory mapped
+# file. The code part is matched by the same alternatives as LINE_RE, except that the whitespace doesn't span over
+# lines and that '#' is excluded from the names and labels, which is the same as matching the line without comment.
+# None of the alternatives match on blank lines.
+LINE_BUFFER_RE = re.compile(
+    br'[^\S\n]*(?:'
+    br'(?P<table>\[(?P<table_name>[^]#\n]+)\])'
+    br'|(?=[^#\n]*--)(?P<relation>(?P<left_name>[^\s#]+)[^\S\n]*(?P<left_cardinality>[*?+1])--'
+    br'(?P<right_cardinality>[*?+1])[^\S\n]*(?P<right_name>[^\s#]+))'
+    br'|(?P<column>(?P<primary>\*?)(?P<column_name>[^\s#]+)[^\S\n]*(?:\{label:[^\S\n]*"(?P<label>[^"#\n]+)"\})?)'
+    br')?[^\n]*\n?'
+)
+
 
 class ParsingException(Exception):
     base_traceback = 'Error on line {line_nb}: {line}\n{error}'
@@ -49,11 +78,80 @@ def filter_lines_from_comments(lines):
         yield line_nb, clean_line, raw_line
 
 
+def _table_from_line_match(match):
+    return Table(
+        name=match.group('table_name'),
+        columns=[],
+    )
+
+
+def _relation_from_line_match(match):
+    left_name, left_cardinality, right_cardinality, right_name = \
+        match.group('left_name', 'left_cardinality', 'right_cardinality', 'right_name')
+    return Relation(
+        right_col=right_name,
+        left_col=left_name,
+        right_cardinality=right_cardinality,
+        left_cardinality=left_cardinality,
+    )
+
+
+def _column_from_line_match(match):
+    primary, name, label = match.group('primary', 'column_name', 'label')
+    return Column(
+        name=name,
+        type=label,
+        is_key=primary == '*',
+    )
+
+
+# Routes from the name of the alternative of LINE_RE which matched to the function building the object.
+switch_line_group_to_method = {
+    'table': _table_from_line_match,
+    'relation': _relation_from_line_match,
+    'column': _column_from_line_match,
+}
+
+
+def _table_from_bytes_match(match, encoding):
+    return Table(
+        name=match.group('table_name').decode(encoding),
+        columns=[],
+    )
+
+
+def _relation_from_bytes_match(match, encoding):
+    left_name, left_cardinality, right_cardinality, right_name = \
+        match.group('left_name', 'left_cardinality', 'right_cardinality', 'right_name')
+    return Relation(
+        right_col=right_name.decode(encoding),
+        left_col=left_name.decode(encoding),
+        right_cardinality=right_cardinality.decode('ascii'),
+        left_cardinality=left_cardinality.decode('ascii'),
+    )
+
+
+def _column_from_bytes_match(match, encoding):
+    primary, name, label = match.group('primary', 'column_name', 'label')
+    return Column(
+        name=name.decode(encoding),
+        type=label.decode(encoding) if label is not None else None,
+        is_key=primary == b'*',
+    )
+
+
+# Same as switch_line_group_to_method for the matches of LINE_BUFFER_RE, decoding the groups used.
+switch_bytes_group_to_method = {
+    'table': _table_from_bytes_match,
+    'relation': _relation_from_bytes_match,
+    'column': _column_from_bytes_match,
+}
+
+
 def parse_line(line):
-    for typ in [Table, Relation, Column]:
-        match = typ.RE.match(line)
-        if match:
-            return typ.make_from_match(match)
+    match = LINE_RE.match(line)
+    if match:
+        return switch_line_group_to_method[match.lastgroup](match)
     msg = 'Line "{}" could not be parsed to an object.'
     raise ValueError(msg.format(line))
 
@@ -90,54 +188,184 @@ def _check_not_creating_duplicates(new_name, names, type, exc):
         raise exc(msg.format(type, new_name))
 
 
-def update_models(new_obj, current_table, tables, relations):
-    """ Update the state of the parsing. """
-    _update_check_inputs(current_table, tables, relations)
-    _check_no_current_table(new_obj, current_table)
-
-    if isinstance(new_obj, Table):
-        tables_names = [t.name for t in tables]
-        _check_not_creating_duplicates(new_obj.name, tables_names, 'table', DuplicateTableException)
-        return new_obj, tables + [new_obj], relations
+class ParsingState:
+    """ State of the parsing, updated in place one object at a time.
+    The tables and relations lists are only appended to and the names of the tables and of the columns of each
+    table are indexed in sets, so that each update is done in constant time.
+    """
+
+    def __init__(self, current_table=None, tables=None, relations=None):
+        self.current_table = current_table
+        self.tables = []
+        self.relations = list(relations or [])
+        self.tables_names = set()
+        self.columns_names = {}
+        for table in tables or []:
+            self._add_table(table)
+
+    def _add_table(self, table):
+        self.tables.append(table)
+        self.tables_names.add(table.name)
+        self.columns_names[table.name] = set(c.name for c in table.columns)
+
+    def update(self, new_obj):
+        """ Adds new_obj to the state, raises a ParsingException if it is not consistent with the state. """
+        _check_no_current_table(new_obj, self.current_table)
+
+        if isinstance(new_obj, Table):
+            _check_not_creating_duplicates(new_obj.name, self.tables_names, 'table', DuplicateTableException)
+            self._add_table(new_obj)
+            self.current_table = new_obj
+            return
 
-    if isinstance(new_obj, Relation):
-        tables_names = [t.name for t in tables]
-        _check_colname_in_lst(new_obj.right_col, tables_names)
-        _check_colname_in_lst(new_obj.left_col, tables_names)
-        return current_table, tables, relations + [new_obj]
+        if isinstance(new_obj, Relation):
+            _check_colname_in_lst(new_obj.right_col, self.tables_names)
+            _check_colname_in_lst(new_obj.left_col, self.tables_names)
+            self.relations.append(new_obj)
+            return
 
-    if isinstance(new_obj, Column):
-        columns_names = [c.name for c in current_table.columns]
-        _check_not_creating_duplicates(new_obj.name, columns_names, 'column', DuplicateColumnException)
-        current_table.columns.append(new_obj)
-        return current_table, tables, relations
+        if isinstance(new_obj, Column):
+            columns_names = self.columns_names[self.current_table.name]
+            _check_not_creating_duplicates(new_obj.name, columns_names, 'column', DuplicateColumnException)
+            self.current_table.columns.append(new_obj)
+            columns_names.add(new_obj.name)
+            return
 
-    msg = "new_obj cannot be of type {}"
-    raise ValueError(msg.format(new_obj.__class__.__name__))
+        msg = "new_obj cannot be of type {}"
+        raise ValueError(msg.format(new_obj.__class__.__name__))
 
 
-def markdown_file_to_intermediary(filename):
-    """ Parse a file and return to intermediary syntax. """
+def update_models(new_obj, current_table, tables, relations):
+    """ Update the state of the parsing.
+    The lists given are not modified, use a ParsingState to parse many objects in linear time.
+    """
+    _update_check_inputs(current_table, tables, relations)
+    state = ParsingState(current_table, tables, relations)
+    state.update(new_obj)
+    return state.current_table, state.tables, state.relations
+
+
+def markdown_file_to_intermediary(filename, use_mmap=False, processes=None):
+    """ Parse a file and return to intermediary syntax.
+    filename is either the path of the file or an already opened stream (sys.stdin, gzip.open(...), ...), which is
+    read lazily line by line and left open. Binary streams are decoded from utf-8.
+    With use_mmap the file at path filename is memory mapped instead, see mmap_file_to_intermediary.
+    processes is passed to line_iterator_to_intermediary.
+    """
+    if use_mmap:
+        return mmap_file_to_intermediary(filename)
+    if hasattr(filename, 'read'):
+        if isinstance(filename, (io.RawIOBase, io.BufferedIOBase)):
+            wrapper = io.TextIOWrapper(filename, encoding='utf-8')
+            try:
+                return line_iterator_to_intermediary(wrapper, processes=processes)
+            finally:
+                # Otherwise the stream of the caller is closed with the wrapper.
+                wrapper.detach()
+        return line_iterator_to_intermediary(filename, processes=processes)
     with open(filename) as f:
-        lines = f.readlines()
-    return line_iterator_to_intermediary(lines)
+        return line_iterator_to_intermediary(f, processes=processes)
+
+
+def split_lines_in_blocks(lines, block_size):
+    """ Groups the lines yielded by filter_lines_from_comments in lists of at least block_size lines, each list but the
+    first one starting with a table header. """
+    block = []
+    for line in lines:
+        if len(block) >= block_size and line[1].startswith('['):
+            yield block
+            block = []
+        block.append(line)
+    if len(block) != 0:
+        yield block
+
+
+def _parse_block(lines):
+    return [parse_line(line) for line in lines]
+
+
+def _parse_lines_in_processes(lines, processes, block_size):
+    """ Same as _parse_lines, the lines being split in blocks parsed by a pool of processes. """
+    pending_blocks = collections.deque()
+
+    def blocks_to_parse():
+        for block in split_lines_in_blocks(lines, block_size):
+            pending_blocks.append(block)
+            yield [line for _, line, _ in block]
+
+    with multiprocessing.Pool(processes) as pool:
+        for new_objs in pool.imap(_parse_block, blocks_to_parse()):
+            block = pending_blocks.popleft()
+            for (line_nb, _, raw_line), new_obj in zip(block, new_objs):
+                yield line_nb, raw_line, new_obj
+
+
+def _parse_lines(lines):
+    """ Yields the line number, the raw line and the object parsed from each line of lines, yielded by
+    filter_lines_from_comments. """
+    for line_nb, line, raw_line in lines:
+        yield line_nb, raw_line, parse_line(line)
+
+
+def line_iterator_to_intermediary(line_iterator, processes=None, block_size=10000):
+    """ Parse an iterator of str (one string per line) to the intermediary syntax.
+    With processes greater than 1, the lines are split in blocks of about block_size lines at the table headers and
+    the blocks are parsed by a pool of processes. The parsed objects are then merged in order in a single state, so
+    the duplicates and the relations are checked globally and the errors are the same as when parsing serially.
+    """
+    lines = filter_lines_from_comments(line_iterator)
+    if processes is not None and processes > 1:
+        parsed_lines = _parse_lines_in_processes(lines, processes, block_size)
+    else:
+        parsed_lines = _parse_lines(lines)
+
+    state = ParsingState()
+    errors = []
+    for line_nb, raw_line, new_obj in parsed_lines:
+        try:
+            state.update(new_obj)
+        except ParsingException as e:
+            e.line_nb = line_nb
+            e.line = raw_line
+            errors.append(e)
+    _check_no_errors(errors)
+    return state.tables, state.relations
+
+
+def mmap_file_to_intermediary(filename, encoding='utf-8'):
+    """ Parse a file by memory mapping it and return to intermediary syntax.
+    The lines are matched over the mapped buffer and only the matched names, types and cardinalities are decoded.
+    Whitespace is ASCII whitespace, as opposed to str.strip which also strips unicode whitespace.
+    """
+    with open(filename, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return [], []
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            return buffer_to_intermediary(buffer, encoding)
 
 
-def line_iterator_to_intermediary(line_iterator):
-    """ Parse an iterator of str (one string per line) to the intermediary syntax"""
-    current_table = None
-    tables = []
-    relations = []
+def buffer_to_intermediary(buffer, encoding='utf-8'):
+    """ Parse a buffer (bytes, mmap, ...) of encoded lines to the intermediary syntax. """
+    state = ParsingState()
     errors = []
-    for line_nb, line, raw_line in filter_lines_from_comments(line_iterator):
+    size = len(buffer)
+    for line_nb, match in enumerate(LINE_BUFFER_RE.finditer(buffer)):
+        if match.lastgroup is None:
+            if match.end() == size:
+                break
+            continue
         try:
-            new_obj = parse_line(line)
-            current_table, tables, relations = update_models(new_obj, current_table, tables, relations)
+            new_obj = switch_bytes_group_to_method[match.lastgroup](match, encoding)
+            state.update(new_obj)
         except ParsingException as e:
             e.line_nb = line_nb
-            e.line = raw_line
+            e.line = match.group(0).decode(encoding)
             errors.append(e)
+    _check_no_errors(errors)
+    return state.tables, state.relations
+
+
+def _check_no_errors(errors):
     if len(errors) != 0:
         msg = 'ERAlchemy couldn\'t complete the generation due the {} following errors'.format(len(errors))
         raise ParsingException(msg + '\n\n'.join(e.traceback for e in errors))
-    return tables, relations
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""
+Binary snapshot of the intermediary representation, much faster to save and to load than the er markup.
+All the integers are little-endian uint32, the layout is:
+    - the magic bytes b'ERBN' and the version (uint16),
+    - the string table: its number of strings, the length in bytes of each string, then the utf-8 strings,
+    - the tables: their number, the index of their names, their numbers of columns,
+    - the columns of all the tables: their number, the index of their names, the index of their types (NO_STRING when
+      the type is None) and their is_key flags (one byte each),
+    - the relations: their number, then for each one the index of right_col, left_col, right_cardinality and
+      left_cardinality.
+Each distinct string is stored once, the names and types being references to the string table.
+"""
+import struct
+
+from eralchemy.models import Column, Relation, Table
+
+MAGIC = b'ERBN'
+
+VERSION = 1
+
+HEADER = struct.Struct('<4sH')
+
+COUNT = struct.Struct('<I')
+
+NO_STRING = 0xFFFFFFFF
+
+
+class SnapshotReader:
+    """ Reads the successive sections of a snapshot, raising ValueError when the data is too short. """
+
+    def __init__(self, data):
+        self.data = data
+        self.offset = 0
+
+    def check_size(self, size):
+        if self.offset + size > len(self.data):
+            raise ValueError('The snapshot is truncated.')
+
+    def read_uint32s(self, count):
+        self.check_size(4 * count)
+        values = struct.unpack_from('<{}I'.format(count), self.data, self.offset)
+        self.offset += 4 * count
+        return values
+
+    def read_count(self):
+        return self.read_uint32s(1)[0]
+
+    def read_bytes(self, size):
+        self.check_size(size)
+        rv = self.data[self.offset:self.offset + size]
+        self.offset += size
+        return rv
+
+    def check_end(self):
+        if self.offset != len(self.data):
+            raise ValueError('The snapshot has trailing data.')
+
+
+def snapshot_dumps(tables, relationships):
+    """ Returns the snapshot of the intermediary representation as bytes. """
+    strings_ids = {}
+
+    def string_id(string):
+        if string is None:
+            return NO_STRING
+        try:
+            return strings_ids[string]
+        except KeyError:
+            strings_ids[string] = len(strings_ids)
+            return strings_ids[string]
+
+    tables_names = [string_id(t.name) for t in tables]
+    tables_sizes = [len(t.columns) for t in tables]
+    columns = [c for t in tables for c in t.columns]
+    columns_names = [string_id(c.name) for c in columns]
+    columns_types = [string_id(c.type) for c in columns]
+    columns_is_key = bytes(bytearray(bool(c.is_key) for c in columns))
+    relations = [
+        string_id(value)
+        for r in relationships
+        for value in (r.right_col, r.left_col, r.right_cardinality, r.left_cardinality)
+    ]
+    strings = [string.encode('utf-8') for string in strings_ids]
+
+    def uint32s(values):
+        return struct.pack('<{}I'.format(len(values)), *values)
+    return b''.join([
+        HEADER.pack(MAGIC, VERSION),
+        COUNT.pack(len(strings)), uint32s([len(s) for s in strings]), b''.join(strings),
+        COUNT.pack(len(tables)), uint32s(tables_names), uint32s(tables_sizes),
+        COUNT.pack(len(columns)), uint32s(columns_names), uint32s(columns_types), columns_is_key,
+        COUNT.pack(len(relationships)), uint32s(relations),
+    ])
+
+
+def snapshot_loads(data):
+    """ Returns the tables and relationships of the snapshot in data (bytes), raises ValueError if data is not a valid
+    snapshot. """
+    if len(data) < HEADER.size or HEADER.unpack_from(data)[0] != MAGIC:
+        raise ValueError('The data is not an eralchemy snapshot.')
+    version = HEADER.unpack_from(data)[1]
+    if version != VERSION:
+        raise ValueError('Version {} of the snapshot is not supported.'.format(version))
+    reader = SnapshotReader(memoryview(data)[HEADER.size:])
+
+    lengths = reader.read_uint32s(reader.read_count())
+    blob = reader.read_bytes(sum(lengths))
+    strings, offset = [], 0
+    for length in lengths:
+        strings.append(bytes(blob[offset:offset + length]).decode('utf-8'))
+        offset += length
+    # The last element is the one of NO_STRING (None).
+    strings.append(None)
+    no_string = len(strings) - 1
+
+    def resolve(ids):
+        if any(i >= no_string and i != NO_STRING for i in ids):
+            raise ValueError('The snapshot refers to a string out of its string table.')
+        return [strings[no_string if i == NO_STRING else i] for i in ids]
+
+    nb_tables = reader.read_count()
+    tables_names = resolve(reader.read_uint32s(nb_tables))
+    tables_sizes = reader.read_uint32s(nb_tables)
+    nb_columns = reader.read_count()
+    columns_names = resolve(reader.read_uint32s(nb_columns))
+    columns_types = resolve(reader.read_uint32s(nb_columns))
+    columns_is_key = reader.read_bytes(nb_columns)
+    if sum(tables_sizes) != nb_columns:
+        raise ValueError('The numbers of columns of the tables of the snapshot do not match its columns.')
+    columns = [Column(name=name, type=typ, is_key=bool(is_key))
+               for name, typ, is_key in zip(columns_names, columns_types, columns_is_key)]
+    tables, start = [], 0
+    for name, size in zip(tables_names, tables_sizes):
+        tables.append(Table(name=name, columns=columns[start:start + size]))
+        start += size
+
+    relations = resolve(reader.read_uint32s(4 * reader.read_count()))
+    reader.check_end()
+    relationships = [
+        Relation(right_col=relations[i], left_col=relations[i + 1],
+                 right_cardinality=relations[i + 2], left_cardinality=relations[i + 3])
+        for i in range(0, len(relations), 4)
+    ]
+    return tables, relationships
+
+
+def intermediary_to_snapshot(tables, relationships, output):
+    """ Saves the intermediary representation to a binary snapshot. """
+    with open(output, 'wb') as file_out:
+        file_out.write(snapshot_dumps(tables, relationships))
+
+
+def snapshot_file_to_intermediary(filename):
+    """ Loads the intermediary representation from a binary snapshot. """
+    with open(filename, 'rb') as file_in:
+        return snapshot_loads(file_in.read())
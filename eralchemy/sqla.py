@@ -3,41 +3,95 @@
 This class allow to transform SQLAlchemy metadata to the intermediary syntax.
 """
 
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from eralchemy.cache import catalog_fingerprint, catalog_tables_fingerprints
+from eralchemy.helpers import compile_names_matcher, build_adjacency, neighborhood, qualified_name
 from eralchemy.models import Relation, Column, Table
 import sys
-from sqlalchemy.exc import CompileError
+from sqlalchemy.exc import CompileError, NoReferenceError
+from sqlalchemy.types import TypeEngine
 
 if sys.version_info[0] == 3:
     unicode = str
 
+# Memoized string representations of the types, keyed by _type_cache_key.
+_formatted_types = {}
+
+# Maximum number of schemas reflected at once, the default size of the connection pool of an engine.
+MAX_REFLECTION_WORKERS = 5
+
 
 def relation_to_intermediary(fk):
     """Transform an SQLAlchemy ForeignKey object to it's intermediary representation. """
     return Relation(
         right_col=format_name(fk.parent.table.fullname),
-        left_col=format_name(fk._column_tokens[1]),
+        left_col=format_name(referred_table_name(fk)),
         right_cardinality='?',
         left_cardinality='*',
     )
 
 
+def referred_table_name(fk):
+    """ Returns the full name of the table referred by the ForeignKey, the schema of the metadata applying when the
+    foreign key does not name the schema of a table missing from the metadata. """
+    try:
+        return fk.column.table.fullname
+    except NoReferenceError:
+        schema, table_name, _ = fk._column_tokens
+        return qualified_name(schema or fk.parent.table.metadata.schema, table_name)
+
+
+def intern_string(string):
+    """ Returns the interned string equal to string, so that the identical names and types of all the tables are stored
+    once. The interned strings no longer referenced are reclaimed. """
+    return sys.intern(string)
+
+
+def _type_cache_key(typ):
+    """ Returns a key made of the class and of the parameters of the type, or None if some parameters are not simple
+    values (or types) which can be hashed. """
+    try:
+        parameters = vars(typ)
+    except TypeError:
+        return None
+    key = [typ.__class__]
+    for name, value in sorted(parameters.items()):
+        if isinstance(value, TypeEngine):
+            value = _type_cache_key(value)
+            if value is None:
+                return None
+        elif not isinstance(value, (unicode, str, int, float, type(None))):
+            return None
+        key.append((name, value))
+    return tuple(key)
+
+
 def format_type(typ):
-    """ Transforms the type into a nice string representation. """
+    """ Transforms the type into a nice string representation.
+    Compiling the type is expensive, so the strings are memoized on the class and parameters of the type. """
+    key = _type_cache_key(typ)
+    if key is not None and key in _formatted_types:
+        return _formatted_types[key]
     try:
-        return unicode(typ)
+        rv = intern_string(unicode(typ))
     except CompileError:
-        return 'Null'
+        rv = 'Null'
+    if key is not None:
+        _formatted_types[key] = rv
+    return rv
 
 
 def format_name(name):
     """ Transforms the name into a nice string representation. """
-    return unicode(name)
+    return intern_string(unicode(name))
 
 
 def column_to_intermediary(col, type_formatter=format_type):
     """Transform an SQLAlchemy Column object to it's intermediary representation. """
     return Column(
-        name=col.name,
+        name=format_name(col.name),
         type=type_formatter(col.type),
         is_key=col.primary_key,
     )
@@ -47,7 +101,7 @@ def table_to_intermediary(table):
     """Transform an SQLAlchemy Table object to it's intermediary representation. """
     return Table(
         name=table.fullname,
-        columns=[column_to_intermediary(col) for col in table.c._data.values()]
+        columns=[column_to_intermediary(col) for col in table.columns]
     )
 
 
@@ -63,22 +117,238 @@ def declarative_to_intermediary(base):
     return metadata_to_intermediary(base.metadata)
 
 
-def name_for_scalar_relationship(base, local_cls, referred_cls, constraint):
-    """ Overriding naming schemes. """
-    name = referred_cls.__name__.lower() + "_ref"
-    return name
+def foreign_keys_neighborhood(inspector, schemas, focus, depth=1):
+    """ Returns the names of the tables of the schemas matching the focus (list of str, tables names or patterns) and
+    of the tables at most depth foreign keys away from them, from the foreign keys of the inspector. """
+    focus_table = compile_names_matcher(focus)
+    edges, seeds = [], []
+    for schema in schemas:
+        names = inspector.get_table_names(schema=schema)
+        if has_bulk_reflection(inspector):
+            tables_fks = ((name, fks) for (_, name), fks in inspector.get_multi_foreign_keys(schema=schema).items())
+        else:
+            tables_fks = ((name, inspector.get_foreign_keys(name, schema=schema)) for name in names)
+        # A referred_schema None is the default schema (the search path of PostgreSQL), as in MetaData.reflect.
+        edges.extend(
+            (qualified_name(schema, name), qualified_name(fk['referred_schema'], fk['referred_table']))
+            for name, fks in tables_fks
+            for fk in fks
+        )
+        seeds.extend(qualified_name(schema, name) for name in names if focus_table(qualified_name(schema, name)))
+    return neighborhood(build_adjacency(edges), seeds, depth)
+
+
+def tables_to_reflect(inspector, schema=None, include_tables=None, exclude_tables=None, focus=None, depth=1):
+    """ Returns the function to pass as `only` to MetaData.reflect to reflect only the tables selected by the
+    include_tables, exclude_tables, focus and depth parameters of eralchemy.main.filter_resources, or None to reflect
+    all the tables. """
+    return schemas_tables_to_reflect(inspector, [schema], include_tables, exclude_tables, focus, depth)[schema]
+
+
+def schemas_tables_to_reflect(inspector, schemas, include_tables=None, exclude_tables=None, focus=None, depth=1):
+    """ Same as tables_to_reflect for several schemas, returns a dict of the `only` function of each schema.
+    The neighborhood of the focus spans over all the schemas. """
+    if not (include_tables or exclude_tables or focus):
+        return dict.fromkeys(schemas)
+    include_table = compile_names_matcher(include_tables) if include_tables else None
+    exclude_table = compile_names_matcher(exclude_tables)
+    if focus:
+        focus_tables = foreign_keys_neighborhood(inspector, schemas, focus, depth)
+    else:
+        focus_tables = None
+
+    def make_only(schema):
+        def only(table_name, metadata):
+            name = qualified_name(schema, table_name)
+            return not exclude_table(name) \
+                and (include_table is None or include_table(name)) \
+                and (focus_tables is None or name in focus_tables)
+        return only
+    return {schema: make_only(schema) for schema in schemas}
+
+
+def has_bulk_reflection(inspector):
+    """ Whether the inspector has the get_multi_* methods of SQLAlchemy 2. """
+    return hasattr(inspector, 'get_multi_columns')
+
+
+def inspector_to_intermediary(inspector, schema=None, only=None):
+    """ Transforms the tables of the schema selected by only (see tables_to_reflect) to the intermediary representation
+    with the get_multi_* methods of the inspector, which fetch the columns, primary keys and foreign keys of all the
+    tables in a few queries. As with MetaData.reflect, the tables referred by the foreign keys are added too. """
+    names = inspector.get_table_names(schema=schema)
+    if only is not None:
+        names = [name for name in names if only(name, None)]
+    tables, relationships = [], []
+    # An empty filter_names would select all the tables of the schema.
+    pending = {schema: names} if names else {}
+    seen = set((schema, name) for name in names)
+    while pending:
+        referred = defaultdict(list)
+        for table_schema, table_names in pending.items():
+            kwargs = dict(schema=table_schema, filter_names=table_names)
+            tables_pks = inspector.get_multi_pk_constraint(**kwargs)
+            tables_fks = inspector.get_multi_foreign_keys(**kwargs)
+            for key, columns in inspector.get_multi_columns(**kwargs).items():
+                name = format_name(qualified_name(table_schema, key[1]))
+                keys = set(tables_pks[key]['constrained_columns'] if tables_pks.get(key) else ())
+                tables.append(Table(
+                    name=name,
+                    columns=[
+                        Column(name=format_name(col['name']), type=format_type(col['type']), is_key=col['name'] in keys)
+                        for col in columns
+                    ],
+                ))
+                for fk in tables_fks.get(key, ()):
+                    # None is the default schema, whose tables are reflected with schema=None as in MetaData.reflect.
+                    referred_schema = fk['referred_schema']
+                    if (referred_schema, fk['referred_table']) not in seen:
+                        seen.add((referred_schema, fk['referred_table']))
+                        referred[referred_schema].append(fk['referred_table'])
+                    # Same as relation_to_intermediary, which gets one ForeignKey per constrained column.
+                    relationships.extend(
+                        Relation(
+                            right_col=name,
+                            left_col=format_name(qualified_name(referred_schema, fk['referred_table'])),
+                            right_cardinality='?',
+                            left_cardinality='*',
+                        )
+                        for _ in fk['constrained_columns']
+                    )
+        pending = referred
+    return tables, relationships
+
+
+def schema_to_intermediary(bind, schema=None, only=None):
+    """ Reflects the tables of the schema selected by only (see tables_to_reflect) to the intermediary representation,
+    bind being an Engine or a Connection.
+    With SQLAlchemy 2 the tables are read with the bulk methods of the inspector (see inspector_to_intermediary),
+    otherwise with MetaData.reflect. """
+    from sqlalchemy import inspect, MetaData
 
+    inspector = inspect(bind)
+    if has_bulk_reflection(inspector):
+        return inspector_to_intermediary(inspector, schema, only)
+    metadata = MetaData(schema=schema)
+    metadata.reflect(bind, only=only)
+    return metadata_to_intermediary(metadata)
 
-def database_to_intermediary(database_uri, schema=None):
-    """ Introspect from the database (given the database_uri) to create the intermediary representation. """
-    from sqlalchemy.ext.automap import automap_base
+
+def schemas_to_intermediary(bind, schemas, include_tables=None, exclude_tables=None, focus=None, depth=1,
+                            max_workers=MAX_REFLECTION_WORKERS):
+    """ Reflects the schemas with the bind (an Engine or a Connection) and merges them in one intermediary
+    representation, the names of the tables being qualified by their schemas. With an Engine, the schemas are reflected
+    concurrently by at most max_workers threads, which share the connection pool of the engine. """
+    from sqlalchemy import inspect
+
+    onlys = schemas_tables_to_reflect(inspect(bind), schemas, include_tables, exclude_tables, focus, depth)
+    return reflect_schemas(bind, onlys, max_workers)
+
+
+def reflect_schemas(bind, onlys, max_workers=MAX_REFLECTION_WORKERS):
+    """ Reflects the tables selected by the `only` function of each schema (dict schema -> only, see
+    schemas_to_intermediary) and merges them in one intermediary representation. """
+    from sqlalchemy.engine import Engine
+
+    schemas = list(onlys)
+    if len(schemas) == 1:
+        return schema_to_intermediary(bind, schemas[0], onlys[schemas[0]])
+    if isinstance(bind, Engine):
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(schemas))) as executor:
+            results = list(executor.map(lambda schema: schema_to_intermediary(bind, schema, onlys[schema]), schemas))
+    else:
+        # A connection cannot be shared by threads.
+        results = [schema_to_intermediary(bind, schema, onlys[schema]) for schema in schemas]
+
+    # A table referred from another schema is reflected with both schemas, it is kept once with its relations.
+    tables, relationships, names = [], [], set()
+    for schema_tables, schema_relationships in results:
+        new_names = set(t.name for t in schema_tables) - names
+        tables.extend(t for t in schema_tables if t.name in new_names)
+        relationships.extend(r for r in schema_relationships if r.right_col in new_names)
+        names.update(new_names)
+    return tables, relationships
+
+
+def only_names(names):
+    """ Returns the `only` function selecting the tables of names. """
+    return lambda table_name, metadata: table_name in names
+
+
+def update_intermediary(bind, schemas, tables, relationships, previous_fingerprints, fingerprints,
+                        include_tables=None, exclude_tables=None, focus=None, depth=1):
+    """ Updates a previous reflection of the schemas (tables and relationships) by reflecting only the tables which
+    changed, the fingerprints being the ones of eralchemy.cache.catalog_tables_fingerprints:
+        - the tables of the previous reflection whose fingerprint changed are reflected again,
+        - the dropped tables are removed,
+        - the new tables are reflected if they are selected by include_tables, exclude_tables, focus and depth.
+    The relations belong to the table of their right_col and are replaced with it. """
+    from sqlalchemy import inspect
+
+    selection = schemas_tables_to_reflect(inspect(bind), schemas, include_tables, exclude_tables, focus, depth)
+    names = set(t.name for t in tables)
+    stale, to_reflect = set(), {}
+    for schema in schemas:
+        previous, current = previous_fingerprints.get(schema, {}), fingerprints[schema]
+        # Only the tables of the previous reflection can be stale, the other ones were not selected.
+        stale.update(qualified_name(schema, name) for name in previous
+                     if current.get(name) != previous[name] and qualified_name(schema, name) in names)
+        selected = selection[schema]
+        to_reflect[schema] = set(
+            name for name in current
+            if qualified_name(schema, name) in stale
+            or (qualified_name(schema, name) not in names and (selected is None or selected(name, None)))
+        )
+    new_tables, new_relationships = reflect_schemas(
+        bind, dict((schema, only_names(schema_names)) for schema, schema_names in to_reflect.items()))
+
+    reflected = set(
+        qualified_name(schema, name) for schema, schema_names in to_reflect.items() for name in schema_names)
+    dropped = stale - reflected
+    tables = [t for t in tables if t.name not in stale] + [t for t in new_tables if t.name in reflected]
+    relationships = [r for r in relationships if r.right_col not in stale and r.left_col not in dropped] \
+        + [r for r in new_relationships if r.right_col in reflected]
+    return tables, relationships
+
+
+def bind_to_intermediary(bind, schema=None, include_tables=None, exclude_tables=None, focus=None, depth=1,
+                         cache=None):
+    """ Reflects the database of the bind (an Engine or a Connection) to the intermediary representation.
+    schema is the name of a schema or a list of names of schemas, see schemas_to_intermediary.
+    With include_tables, exclude_tables or focus, only the selected tables (and the tables they refer to) are
+    reflected, see tables_to_reflect.
+    With a cache (eralchemy.cache.ReflectionCache), the reflection is skipped while the fingerprint of the catalog is
+    unchanged. With an incremental cache, only the tables which changed are reflected again, see
+    update_intermediary. """
+    schemas = list(schema) if isinstance(schema, (list, tuple)) else [schema]
+    fingerprint = catalog_fingerprint(bind, schemas) if cache is not None else None
+    if fingerprint is None:
+        return schemas_to_intermediary(bind, schemas, include_tables, exclude_tables, focus, depth)
+    key = cache.key(bind.engine.url, schemas, include_tables=include_tables, exclude_tables=exclude_tables,
+                    focus=focus, depth=depth)
+    entry = cache.load(key)
+    if entry is not None and entry['fingerprint'] == fingerprint:
+        return entry['tables'], entry['relationships']
+
+    tables_fingerprints = catalog_tables_fingerprints(bind, schemas) if cache.incremental else None
+    if tables_fingerprints is not None and entry is not None and entry.get('tables_fingerprints') is not None:
+        tables, relationships = update_intermediary(
+            bind, schemas, entry['tables'], entry['relationships'], entry['tables_fingerprints'],
+            tables_fingerprints, include_tables, exclude_tables, focus, depth)
+    else:
+        tables, relationships = schemas_to_intermediary(bind, schemas, include_tables, exclude_tables, focus, depth)
+    cache.set(key, fingerprint, tables, relationships, tables_fingerprints)
+    return tables, relationships
+
+
+def database_to_intermediary(database_uri, schema=None, include_tables=None, exclude_tables=None, focus=None,
+                             depth=1, cache=None):
+    """ Introspect from the database (given the database_uri) to create the intermediary representation, see
+    bind_to_intermediary for the parameters. """
     from sqlalchemy import create_engine
 
-    Base = automap_base()
     engine = create_engine(database_uri)
-    if schema is not None:
-        Base.metadata.schema = schema
-
-    # reflect the tables
-    Base.prepare(engine, reflect=True, name_for_scalar_relationship=name_for_scalar_relationship)
-    return declarative_to_intermediary(Base)
+    try:
+        return bind_to_intermediary(engine, schema, include_tables, exclude_tables, focus, depth, cache)
+    finally:
+        engine.dispose()
@@ -58,6 +58,4 @@ class Edge(Base):
 
 
 if __name__ == '__main__':
-    render_er(Base, 'graph.png')
-    render_er(Base, 'graph.dot')
-    render_er(Base, 'graph.pdf')
+    render_er(Base, ['graph.png', 'graph.dot', 'graph.pdf'])
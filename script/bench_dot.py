@@ -0,0 +1,31 @@
+"""
+Benchmark of the dot rendering of the tables, reports the time to render a generated schema with the former
+templates formatted column by column and with the precomputed fragments joined once per table.
+"""
+from __future__ import print_function
+import argparse
+import timeit
+
+from eralchemy.parser import line_iterator_to_intermediary
+from tests.common import legacy_table_to_dot, make_corpus
+
+
+def cli():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tables', type=int, default=10000, help='Number of tables in the schema.')
+    parser.add_argument('--columns', type=int, default=50, help='Number of columns per table.')
+    parser.add_argument('--repeat', type=int, default=3, help='Number of runs, the best one is reported.')
+    args = parser.parse_args()
+
+    tables, _ = line_iterator_to_intermediary(make_corpus(args.tables, args.columns))
+    print('Schema of {} tables and {} columns.'.format(args.tables, args.tables * args.columns))
+    legacy = [legacy_table_to_dot(t) for t in tables]
+    assert [t.to_dot() for t in tables] == legacy, 'The output differs from the former one.'
+    before = min(timeit.repeat(lambda: [legacy_table_to_dot(t) for t in tables], number=1, repeat=args.repeat))
+    after = min(timeit.repeat(lambda: [t.to_dot() for t in tables], number=1, repeat=args.repeat))
+    print('before: {:>7.3f} s'.format(before))
+    print('after:  {:>7.3f} s ({:.2f}x)'.format(after, before / after))
+
+
+if __name__ == '__main__':
+    cli()
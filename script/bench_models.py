@@ -0,0 +1,66 @@
+"""
+Memory benchmark of the intermediary models, reports the memory used by the columns of a generated schema.
+"""
+from __future__ import print_function
+import argparse
+import tracemalloc
+
+from eralchemy.models import Column, Table
+
+
+class LegacyColumn:
+    """ Former Column, storing its attributes in a __dict__. """
+
+    def __init__(self, name, type=None, is_key=False):
+        self.name = name
+        self.type = type
+        self.is_key = is_key
+
+
+class LegacyTable:
+    """ Former Table, storing its attributes in a __dict__. """
+
+    def __init__(self, name, columns):
+        self.name = name
+        self.columns = columns
+
+
+def make_schema(table_cls, column_cls, nb_tables, nb_columns, names, types):
+    return [
+        table_cls(
+            name='table_{}'.format(i),
+            columns=[column_cls(name=names[j], type=types[j % len(types)], is_key=j == 0) for j in range(nb_columns)],
+        )
+        for i in range(nb_tables)
+    ]
+
+
+def measure(table_cls, column_cls, nb_tables, nb_columns):
+    """ Returns the memory in bytes allocated to build the schema, the names and types being shared. """
+    names = ['column_{}'.format(j) for j in range(nb_columns)]
+    types = ['INTEGER', 'VARCHAR(255)', 'TIMESTAMP WITHOUT TIME ZONE']
+    tracemalloc.start()
+    schema = make_schema(table_cls, column_cls, nb_tables, nb_columns, names, types)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del schema
+    return size
+
+
+def cli():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tables', type=int, default=10000, help='Number of tables in the schema.')
+    parser.add_argument('--columns', type=int, default=30, help='Number of columns per table.')
+    args = parser.parse_args()
+
+    nb_columns = args.tables * args.columns
+    print('Schema of {} tables and {} columns.'.format(args.tables, nb_columns))
+    before = measure(LegacyTable, LegacyColumn, args.tables, args.columns)
+    after = measure(Table, Column, args.tables, args.columns)
+    print('before: {:>8.1f} MiB, {:>5.0f} bytes per column'.format(before / 2 ** 20, before / nb_columns))
+    print('after:  {:>8.1f} MiB, {:>5.0f} bytes per column ({:.2f}x)'.format(
+        after / 2 ** 20, after / nb_columns, before / after))
+
+
+if __name__ == '__main__':
+    cli()
@@ -0,0 +1,71 @@
+"""
+Micro-benchmark of the .er markup parser, reports the lines parsed per second.
+"""
+from __future__ import print_function
+import argparse
+import os
+import tempfile
+import timeit
+
+from eralchemy.models import Table, Relation, Column
+from eralchemy.parser import parse_line, remove_comments_from_line, line_iterator_to_intermediary, \
+    markdown_file_to_intermediary
+from tests.common import make_corpus
+
+
+def legacy_remove_comments_from_line(line):
+    if '#' not in line:
+        return line.strip()
+    return line[:line.index('#')].strip()
+
+
+def legacy_parse_line(line):
+    """ Former implementation of parse_line, trying the regex of each model one after the other. """
+    for typ in [Table, Relation, Column]:
+        match = typ.RE.match(line)
+        if match:
+            return typ.make_from_match(match)
+    msg = 'Line "{}" could not be parsed to an object.'
+    raise ValueError(msg.format(line))
+
+
+def bench_lines(lines, remove_comments, parse, repeat):
+    def run():
+        for line in lines:
+            clean_line = remove_comments(line)
+            if clean_line != '':
+                parse(clean_line)
+    return len(lines) / min(timeit.repeat(run, number=1, repeat=repeat))
+
+
+def cli():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tables', type=int, default=2000, help='Number of tables in the corpus.')
+    parser.add_argument('--columns', type=int, default=20, help='Number of columns per table.')
+    parser.add_argument('--repeat', type=int, default=5, help='Number of runs, the best one is reported.')
+    args = parser.parse_args()
+
+    lines = make_corpus(args.tables, args.columns)
+    print('Corpus of {} lines.'.format(len(lines)))
+    before = bench_lines(lines, legacy_remove_comments_from_line, legacy_parse_line, args.repeat)
+    after = bench_lines(lines, remove_comments_from_line, parse_line, args.repeat)
+    print('parse_line before: {:>12,.0f} lines/s'.format(before))
+    print('parse_line after:  {:>12,.0f} lines/s ({:.2f}x)'.format(after, after / before))
+    total = min(timeit.repeat(lambda: line_iterator_to_intermediary(lines), number=1, repeat=args.repeat))
+    print('line_iterator_to_intermediary: {:>12,.0f} lines/s'.format(len(lines) / total))
+
+    fd, path = tempfile.mkstemp(suffix='.er')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.writelines(lines)
+        for use_mmap in (False, True):
+            total = min(timeit.repeat(lambda: markdown_file_to_intermediary(path, use_mmap=use_mmap),
+                                      number=1, repeat=args.repeat))
+            print('markdown_file_to_intermediary(use_mmap={}): {:>12,.0f} lines/s'.format(
+                use_mmap, len(lines) / total))
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    cli()
@@ -0,0 +1,110 @@
+"""
+Benchmark of the database introspection, reports the time to reflect a generated SQLite database.
+"""
+from __future__ import print_function
+import argparse
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+import timeit
+
+from sqlalchemy import create_engine, inspect, MetaData
+
+from eralchemy.cache import ReflectionCache
+from eralchemy.sqla import database_to_intermediary, declarative_to_intermediary, metadata_to_intermediary, \
+    has_bulk_reflection
+
+
+def name_for_scalar_relationship(base, local_cls, referred_cls, constraint):
+    return referred_cls.__name__.lower() + "_ref"
+
+
+def legacy_database_to_intermediary(database_uri, schema=None):
+    """ Former implementation of database_to_intermediary, generating the automap classes of all the tables. """
+    from sqlalchemy.ext.automap import automap_base
+
+    Base = automap_base()
+    engine = create_engine(database_uri)
+    if schema is not None:
+        Base.metadata.schema = schema
+
+    # reflect the tables
+    Base.metadata.reflect(engine)
+    Base.prepare(name_for_scalar_relationship=name_for_scalar_relationship)
+    return declarative_to_intermediary(Base)
+
+
+def reflect_database_to_intermediary(database_uri, schema=None):
+    """ Reflection of all the tables in a MetaData, the path used without the bulk inspector methods. """
+    engine = create_engine(database_uri)
+    metadata = MetaData(schema=schema)
+    metadata.reflect(engine)
+    engine.dispose()
+    return metadata_to_intermediary(metadata)
+
+
+def make_database(path, nb_tables, nb_columns):
+    """ Creates a SQLite database of nb_tables tables of nb_columns columns, the table i referring to the table
+    (i - 1) // 2 so that the foreign keys form a shallow tree. """
+    connection = sqlite3.connect(path)
+    for i in range(nb_tables):
+        columns = ['id INTEGER PRIMARY KEY']
+        columns.extend('column_{} VARCHAR(255)'.format(j) for j in range(nb_columns - 2))
+        if i > 0:
+            columns.append('parent_id INTEGER REFERENCES table_{}(id)'.format((i - 1) // 2))
+        connection.execute('CREATE TABLE table_{} ({})'.format(i, ', '.join(columns)))
+    connection.commit()
+    connection.close()
+
+
+def cli():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tables', type=int, default=5000, help='Number of tables in the database.')
+    parser.add_argument('--columns', type=int, default=10, help='Number of columns per table.')
+    parser.add_argument('--repeat', type=int, default=3, help='Number of runs, the best one is reported.')
+    args = parser.parse_args()
+
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    try:
+        make_database(path, args.tables, args.columns)
+        uri = 'sqlite:///{}'.format(path)
+        print('Database of {} tables of {} columns.'.format(args.tables, args.columns))
+        before = min(timeit.repeat(lambda: legacy_database_to_intermediary(uri), number=1, repeat=args.repeat))
+        print('automap:                {:>8.2f} s'.format(before))
+        after = min(timeit.repeat(lambda: reflect_database_to_intermediary(uri), number=1, repeat=args.repeat))
+        print('MetaData.reflect:       {:>8.2f} s ({:.2f}x)'.format(after, before / after))
+        if has_bulk_reflection(inspect(create_engine(uri))):
+            after = min(timeit.repeat(lambda: database_to_intermediary(uri), number=1, repeat=args.repeat))
+            print('bulk inspector:         {:>8.2f} s ({:.2f}x)'.format(after, before / after))
+        bench_incremental(path, uri)
+    finally:
+        os.remove(path)
+
+
+def bench_incremental(path, uri, nb_changes=3):
+    """ Times the update of a cached reflection after a migration changing nb_changes tables. """
+    directory = tempfile.mkdtemp()
+    try:
+        cache = ReflectionCache(directory, incremental=True)
+        start = time.time()
+        database_to_intermediary(uri, cache=cache)
+        full = time.time() - start
+        connection = sqlite3.connect(path)
+        for i in range(nb_changes):
+            connection.execute('ALTER TABLE table_{} ADD COLUMN migrated INTEGER'.format(i))
+        connection.commit()
+        connection.close()
+        start = time.time()
+        database_to_intermediary(uri, cache=cache)
+        incremental = time.time() - start
+        print('cached reflection:      {:>8.2f} s'.format(full))
+        print('incremental, {} tables: {:>8.2f} s ({:.2f}x)'.format(nb_changes, incremental, full / incremental))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    cli()
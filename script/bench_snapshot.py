@@ -0,0 +1,49 @@
+"""
+Benchmark of the persisted intermediary formats, reports the time to save and to load a generated schema as er markup
+and as binary snapshot.
+"""
+from __future__ import print_function
+import argparse
+import os
+import tempfile
+import timeit
+
+from eralchemy.main import intermediary_to_markdown
+from eralchemy.parser import line_iterator_to_intermediary, markdown_file_to_intermediary
+from eralchemy.snapshot import intermediary_to_snapshot, snapshot_file_to_intermediary
+from tests.common import make_corpus
+
+
+def bench(save, load, path, tables, relationships, repeat):
+    """ Returns the best times to save and to load the schema, and the size of the file. """
+    save_time = min(timeit.repeat(lambda: save(tables, relationships, path), number=1, repeat=repeat))
+    load_time = min(timeit.repeat(lambda: load(path), number=1, repeat=repeat))
+    return save_time, load_time, os.path.getsize(path)
+
+
+def cli():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tables', type=int, default=10000, help='Number of tables in the schema.')
+    parser.add_argument('--columns', type=int, default=30, help='Number of columns per table.')
+    parser.add_argument('--repeat', type=int, default=3, help='Number of runs, the best one is reported.')
+    args = parser.parse_args()
+
+    tables, relationships = line_iterator_to_intermediary(make_corpus(args.tables, args.columns))
+    print('Schema of {} tables and {} columns.'.format(args.tables, args.tables * args.columns))
+    directory = tempfile.mkdtemp()
+    try:
+        for name, save, load, extension in [
+            ('er markup', intermediary_to_markdown, markdown_file_to_intermediary, 'er'),
+            ('snapshot', intermediary_to_snapshot, snapshot_file_to_intermediary, 'erbin'),
+        ]:
+            path = os.path.join(directory, 'schema.' + extension)
+            save_time, load_time, size = bench(save, load, path, tables, relationships, args.repeat)
+            print('{:<10} save {:>7.3f} s, load {:>7.3f} s, {:>7.1f} MiB'.format(
+                name, save_time, load_time, size / 2 ** 20))
+            os.remove(path)
+    finally:
+        os.rmdir(directory)
+
+
+if __name__ == '__main__':
+    cli()
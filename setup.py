@@ -71,6 +71,9 @@ setup(
         'pygraphviz',
         'psycopg2-binary',
     ],
+    extras_require={
+        'async': ['SQLAlchemy[asyncio]>=1.4'],
+    },
     entry_points={
         'console_scripts': [
             'eralchemy=eralchemy.main:cli',
@@ -6,6 +6,7 @@ from dotenv import load_dotenv
 from sqlalchemy import Column, Integer, String, ForeignKey
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
+from eralchemy.cst import GRAPH_BEGINNING, TABLE, FONT_TAGS, ROW_TAGS
 from eralchemy.models import Column as ERColumn, Relation, Table
 from sqlalchemy import create_engine
 
@@ -216,3 +217,47 @@ def create_db(db_uri=DEFAULT_DB_URI, use_sqlite=False):
     tables = (use_sqlite and [m.__table__ for m in (Parent, Child, Exclude)]) or None
     Base.metadata.create_all(engine, tables=tables)
     return db_uri
+
+
+def make_corpus(nb_tables, nb_columns):
+    """ Generates the lines of an .er file with nb_tables tables of nb_columns columns. """
+    lines = []
+    for i in range(nb_tables):
+        lines.append('[table_{}]  # table number {}\n'.format(i, i))
+        lines.append('    *id {label:"INTEGER"}\n')
+        for j in range(nb_columns - 1):
+            lines.append('    column_{} {{label:"VARCHAR(255)"}}\n'.format(j))
+        lines.append('\n')
+    lines.extend('table_{} *--1 table_{}\n'.format(i, i + 1) for i in range(nb_tables - 1))
+    return lines
+
+
+def legacy_column_to_dot(column):
+    """ Former implementation of Column.to_dot. """
+    base = ROW_TAGS.format(' ALIGN="LEFT"', '{key_opening}{col_name}{key_closing}{type}')
+    return base.format(
+        key_opening='<u>' if column.is_key else '',
+        key_closing='</u>' if column.is_key else '',
+        col_name=FONT_TAGS.format(column.name),
+        type=FONT_TAGS.format(' [{}]').format(column.type) if column.type is not None else ''
+    )
+
+
+def legacy_table_to_dot(table):
+    """ Former implementation of Table.to_dot. """
+    body = ''.join(legacy_column_to_dot(c) for c in table.columns)
+    return TABLE.format(table.name, table.header_dot, body)
+
+
+def legacy_intermediary_to_markdown(tables, relationships):
+    """ Former implementation of _intermediary_to_markdown. """
+    t = '\n'.join(t.to_markdown() for t in tables)
+    r = '\n'.join(r.to_markdown() for r in relationships)
+    return '{}\n{}'.format(t, r)
+
+
+def legacy_intermediary_to_dot(tables, relationships):
+    """ Former implementation of _intermediary_to_dot. """
+    t = '\n'.join(t.to_dot() for t in tables)
+    r = '\n'.join(r.to_dot() for r in relationships)
+    return '{}\n{}\n{}\n}}'.format(GRAPH_BEGINNING, t, r)
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+import asyncio
+
+import pytest
+
+pytest.importorskip('sqlalchemy.ext.asyncio')
+pytest.importorskip('aiosqlite')
+
+from sqlalchemy.ext.asyncio import create_async_engine  # noqa: E402
+
+from eralchemy.aio import async_all_to_intermediary, async_render_er, is_async_database_uri  # noqa: E402
+from eralchemy.main import all_to_intermediary, render_er  # noqa: E402
+from tests.common import create_db, markdown, check_intermediary_representation_simple_table  # noqa: E402
+
+
+@pytest.fixture
+def db_path(tmpdir):
+    path = str(tmpdir.join('test.db'))
+    create_db(db_uri='sqlite:///{}'.format(path), use_sqlite=True)
+    return path
+
+
+def test_is_async_database_uri():
+    assert is_async_database_uri('sqlite+aiosqlite:///test.db')
+    assert not is_async_database_uri('sqlite:///test.db')
+    assert not is_async_database_uri('test.er')
+    assert not is_async_database_uri(markdown.split('\n'))
+
+
+def test_async_all_to_intermediary_uri(db_path):
+    tables, relationships = asyncio.run(async_all_to_intermediary('sqlite+aiosqlite:///{}'.format(db_path)))
+    check_intermediary_representation_simple_table(tables, relationships)
+    assert (tables, relationships) == all_to_intermediary('sqlite:///{}'.format(db_path))
+
+
+def test_async_all_to_intermediary_engine_left_open(db_path):
+    engine = create_async_engine('sqlite+aiosqlite:///{}'.format(db_path))
+    pool = engine.sync_engine.pool
+
+    async def reflect():
+        tables, _ = await async_all_to_intermediary(engine, include_tables=['child'])
+        # The engine of the caller is not disposed.
+        assert engine.sync_engine.pool is pool
+        async with engine.connect() as connection:
+            tables_from_connection, _ = await async_all_to_intermediary(connection, include_tables=['child'])
+        await engine.dispose()
+        return tables, tables_from_connection
+    tables, tables_from_connection = asyncio.run(reflect())
+    assert sorted(t.name for t in tables) == ['child', 'parent']
+    assert tables_from_connection == tables
+
+
+def test_async_all_to_intermediary_markdown():
+    tables, relationships = asyncio.run(async_all_to_intermediary(markdown.split('\n')))
+    check_intermediary_representation_simple_table(tables, relationships)
+
+
+def test_async_render_er(db_path, tmpdir):
+    output, expected = str(tmpdir.join('async.er')), str(tmpdir.join('sync.er'))
+    asyncio.run(async_render_er('sqlite+aiosqlite:///{}'.format(db_path), output, exclude_tables=['exclude']))
+    render_er('sqlite:///{}'.format(db_path), expected, exclude_tables=['exclude'])
+    with open(output) as f, open(expected) as g:
+        assert f.read() == g.read()
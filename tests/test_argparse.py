@@ -14,3 +14,15 @@ def test_version():
 
 def test_normal():
     parse_test('-i sqlite:///relative/path/to/db.db -o erd_from_sqlite.pdf'.split(' '))
+
+
+def test_several_outputs():
+    parse_test('-i sqlite:///relative/path/to/db.db -o erd.pdf erd.svg erd.er'.split(' '))
+
+
+def test_layout_engine():
+    parse_test('-i sqlite:///relative/path/to/db.db -o erd.svg --prog sfdp'.split(' '))
+
+
+def test_focus():
+    parse_test('-i sqlite:///relative/path/to/db.db -o erd.pdf --focus users orders --depth 2'.split(' '))
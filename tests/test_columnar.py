@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+from eralchemy.columnar import ColumnarIntermediary, NO_TYPE
+from eralchemy.main import _intermediary_to_dot, _intermediary_to_markdown, filter_resources
+from eralchemy.models import Column, Relation, Table
+from tests.common import tables, relationships
+
+no_type_table = Table(
+    name='no_type',
+    columns=[Column(name='id', is_key=True), Column(name='parent_id', type='INTEGER')],
+)
+no_card_relation = Relation(right_col='no_type', left_col='parent', right_cardinality='', left_cardinality='')
+all_tables = tables + [no_type_table]
+all_relationships = relationships + [no_card_relation]
+
+
+def test_columnar_round_trip():
+    columnar = ColumnarIntermediary.from_intermediary(all_tables, all_relationships)
+    assert len(columnar) == 4
+    assert columnar.tables_names == ['parent', 'child', 'exclude', 'no_type']
+    assert list(columnar.tables_offsets) == [0, 2, 4, 6, 8]
+    assert columnar.types == ['INTEGER', 'VARCHAR(255)']
+    assert columnar.columns_types[6] == NO_TYPE
+    actual_tables, actual_relationships = columnar.to_intermediary()
+    assert [t.name for t in actual_tables] == [t.name for t in all_tables]
+    for actual, expected in zip(actual_tables, all_tables):
+        assert actual.columns == expected.columns
+    assert actual_relationships == all_relationships
+
+
+def test_columnar_to_dot():
+    columnar = ColumnarIntermediary.from_intermediary(all_tables, all_relationships)
+    assert columnar.to_dot() == _intermediary_to_dot(all_tables, all_relationships)
+
+
+def test_columnar_to_markdown():
+    columnar = ColumnarIntermediary.from_intermediary(all_tables, all_relationships)
+    assert columnar.to_markdown() == _intermediary_to_markdown(all_tables, all_relationships)
+
+
+def test_columnar_filter_resources():
+    columnar = ColumnarIntermediary.from_intermediary(all_tables, all_relationships)
+    filters = [
+        {},
+        {'include_tables': ['parent', 'child']},
+        {'exclude_tables': ['exclude']},
+        {'include_columns': ['id']},
+        {'exclude_columns': ['id']},
+        {'include_tables': ['no_type', 'parent'], 'exclude_columns': ['parent_id']},
+        {'include_tables': ['re:.*t'], 'exclude_tables': ['p*']},
+        {'focus': ['child'], 'depth': 1},
+        {'focus': ['child'], 'depth': 2, 'exclude_tables': ['exclude']},
+    ]
+    for kwargs in filters:
+        expected_tables, expected_relationships = filter_resources(all_tables, all_relationships, **kwargs)
+        actual_tables, actual_relationships = columnar.filter_resources(**kwargs).to_intermediary()
+        assert [t.name for t in actual_tables] == [t.name for t in expected_tables]
+        for actual, expected in zip(actual_tables, expected_tables):
+            assert actual.columns == expected.columns
+        assert actual_relationships == expected_relationships
@@ -0,0 +1,19 @@
+from eralchemy.helpers import compile_names_matcher, build_adjacency, neighborhood
+
+
+def test_compile_names_matcher():
+    match = compile_names_matcher(['users', 'audit.*', 're:tmp_[0-9]+', 'log_?'])
+    for name in ('users', 'audit.logs', 'tmp_12', 'log_1'):
+        assert match(name)
+    for name in ('users2', 'audit', 'public.users', 'tmp_12a', 'log_12'):
+        assert not match(name)
+    assert not compile_names_matcher(None)('users')
+
+
+def test_neighborhood():
+    adjacency = build_adjacency([('a', 'b'), ('b', 'c'), ('c', 'd'), ('e', 'a')])
+    assert neighborhood(adjacency, ['a'], 0) == {'a'}
+    assert neighborhood(adjacency, ['a'], 1) == {'a', 'b', 'e'}
+    assert neighborhood(adjacency, ['a'], 2) == {'a', 'b', 'c', 'e'}
+    assert neighborhood(adjacency, ['a', 'd'], 1) == {'a', 'b', 'c', 'd', 'e'}
+    assert neighborhood(adjacency, ['unknown'], 5) == {'unknown'}
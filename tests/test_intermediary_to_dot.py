@@ -4,9 +4,12 @@ import sys
 import re
 from multiprocessing import Process
 from pygraphviz import AGraph
-from tests.common import parent_id, parent_name, child_id, child_parent_id, relation, child, parent
-from eralchemy.main import _intermediary_to_dot
+from tests.common import parent_id, parent_name, child_id, child_parent_id, relation, child, parent, \
+    legacy_column_to_dot, legacy_table_to_dot, make_corpus
+from eralchemy.main import _intermediary_to_dot, intermediary_to_graph
 from eralchemy.cst import GRAPH_BEGINNING
+from eralchemy.models import Column, Relation, Table
+from eralchemy.parser import line_iterator_to_intermediary
 
 GRAPH_LAYOUT = GRAPH_BEGINNING + "%s }"
 column_re = re.compile('\\<TR\\>\\<TD\\ ALIGN\\=\\"LEFT\\"\\>(.*)\\<\\/TD\\>\\<\\/TR\\>')
@@ -89,3 +92,32 @@ def assert_table_well_rendered_to_dot(table):
 def test_table():
     assert_table_well_rendered_to_dot(child)
     assert_table_well_rendered_to_dot(parent)
+
+
+def test_table_same_as_legacy():
+    table = Table(name=u'commandé', columns=[
+        Column(name='id', type='INTEGER', is_key=True),
+        Column(name='key_no_type', is_key=True),
+        Column(name=u'prénom', type='VARCHAR(255)'),
+        Column(name='no_type'),
+        Column(name='empty_type', type=''),
+    ])
+    for t in [child, parent, table, Table(name='empty', columns=[])]:
+        assert t.to_dot() == legacy_table_to_dot(t)
+        for col in t.columns:
+            assert col.to_dot() == legacy_column_to_dot(col)
+
+
+def test_corpus_same_as_legacy():
+    tables, _ = line_iterator_to_intermediary(make_corpus(500, 30))
+    assert [t.to_dot() for t in tables] == [legacy_table_to_dot(t) for t in tables]
+
+
+def test_intermediary_to_graph_same_as_dot():
+    table = Table(name=u'commandé', columns=[Column(name='id', is_key=True), Column(name=u'prénom', type='TEXT')])
+    tables = [child, parent, table, Table(name='empty', columns=[])]
+    relations = [relation, relation, Relation(u'commandé', 'parent', '', ''), Relation('missing', 'parent', '+', '')]
+    expected = AGraph().from_string(_intermediary_to_dot(tables, relations))
+    graph = intermediary_to_graph(tables, relations)
+    assert graph.string() == expected.string()
+    assert graph.draw(format='svg', prog='dot') == expected.draw(format='svg', prog='dot')
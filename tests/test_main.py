@@ -1,13 +1,18 @@
 # -*- coding: utf-8 -*-
+import io
 import os
 
-from eralchemy.main import all_to_intermediary, get_output_mode, intermediary_to_schema, \
-    intermediary_to_dot, intermediary_to_markdown, filter_resources
+from eralchemy.cst import LAYOUT_ENGINES_ATTRIBUTES
+from eralchemy.main import all_to_intermediary, get_output_mode, intermediary_to_schema, render_er, get_layout_engine, \
+    intermediary_to_graph, intermediary_to_dot, intermediary_to_markdown, filter_resources, _intermediary_to_dot, \
+    _intermediary_to_markdown
 from tests.common import Base, check_tables_relationships, check_intermediary_representation_simple_table, create_db, \
     markdown, relationships, tables, check_intermediary_representation_simple_all_table, check_tables_columns, \
-    check_intermediary_representation_dbml_fixture, check_filter
+    check_intermediary_representation_dbml_fixture, check_filter, legacy_intermediary_to_dot, \
+    legacy_intermediary_to_markdown
 
 import pytest
+from pygraphviz import AGraph
 
 
 current_folder, _ = os.path.split(__file__)
@@ -24,6 +29,24 @@ def test_all_to_intermediary_db_sqlite():
     check_intermediary_representation_simple_table(tables, relationships)
 
 
+def test_all_to_intermediary_engine_and_connection(tmpdir):
+    from sqlalchemy import create_engine
+    engine = create_engine(create_db(db_uri='sqlite:///{}'.format(tmpdir.join('test.db')), use_sqlite=True))
+    pool = engine.pool
+    tables, relationships = all_to_intermediary(engine)
+    check_intermediary_representation_simple_table(tables, relationships)
+    # The engine of the caller is not disposed.
+    assert engine.pool is pool
+
+    tables, _ = all_to_intermediary(engine.execution_options(), include_tables=['child'])
+    assert sorted(t.name for t in tables) == ['child', 'parent']
+
+    with engine.connect() as connection:
+        tables, relationships = all_to_intermediary(connection)
+        assert not connection.closed
+    check_intermediary_representation_simple_table(tables, relationships)
+
+
 def test_all_to_intermediary_db():
     db_uri = create_db()
     tables, relationships = all_to_intermediary(db_uri)
@@ -35,6 +58,11 @@ def test_all_to_intermediary_markdown():
     check_intermediary_representation_simple_table(tables, relationships)
 
 
+def test_all_to_intermediary_markdown_stream():
+    tables, relationships = all_to_intermediary(io.StringIO(markdown))
+    check_intermediary_representation_simple_table(tables, relationships)
+
+
 def test_all_to_intermediary_dbml():
     tables, relationships = all_to_intermediary(dbml_fixture_filename)
     check_intermediary_representation_dbml_fixture(tables, relationships)
@@ -70,6 +98,36 @@ def test_filter_exclude_columns():
     check_tables_columns(actual_tables, id_is_included=False)
 
 
+def test_filter_include_tables_patterns():
+    for patterns in (['par*', 'child'], ['re:(par|chi).*'], ['[pc]*'], ['parent', 're:ch.ld']):
+        actual_tables, actual_relationships = filter_resources(tables, relationships, include_tables=patterns)
+        check_tables_relationships(actual_tables, actual_relationships)
+
+
+def test_filter_exclude_tables_patterns():
+    actual_tables, actual_relationships = filter_resources(tables, relationships, exclude_tables=['ex*'])
+    check_tables_relationships(actual_tables, actual_relationships)
+
+
+def test_filter_focus():
+    actual_tables, actual_relationships = filter_resources(tables, relationships, focus=['child'], depth=1)
+    check_tables_relationships(actual_tables, actual_relationships)
+    actual_tables, actual_relationships = filter_resources(tables, relationships, focus=['child'], depth=0)
+    assert [t.name for t in actual_tables] == ['child']
+    assert actual_relationships == []
+    actual_tables, actual_relationships = filter_resources(tables, relationships, focus=['child'], depth=2)
+    check_filter(actual_tables, actual_relationships)
+
+
+def test_filter_copy_on_write():
+    actual_tables, actual_relationships = filter_resources(tables, relationships, include_tables=['parent', 'child'],
+                                                           exclude_columns=['name'])
+    assert [len(t.columns) for t in tables] == [2, 2, 2]
+    assert actual_tables[0] is not tables[0]
+    assert actual_tables[1] is tables[1]
+    assert actual_relationships[0] is relationships[0]
+
+
 def test_get_output_mode():
     assert get_output_mode('hello.png', 'auto') == intermediary_to_schema
     assert get_output_mode('hello.er', 'auto') == intermediary_to_markdown
@@ -83,5 +141,64 @@ def test_get_output_mode():
         get_output_mode('anything', 'mode')
 
 
+@pytest.mark.parametrize('tables, relationships', [(tables, relationships), (tables[:1], []), ([], [])])
+def test_intermediary_to_output_same_as_legacy(tmpdir, tables, relationships):
+    assert _intermediary_to_dot(tables, relationships) == legacy_intermediary_to_dot(tables, relationships)
+    assert _intermediary_to_markdown(tables, relationships) == legacy_intermediary_to_markdown(tables, relationships)
+
+    for intermediary_to_output, legacy in [(intermediary_to_dot, legacy_intermediary_to_dot),
+                                           (intermediary_to_markdown, legacy_intermediary_to_markdown)]:
+        stream = io.StringIO()
+        intermediary_to_output(tables, relationships, stream)
+        assert stream.getvalue() == legacy(tables, relationships)
+        path = str(tmpdir.join('output'))
+        intermediary_to_output(tables, relationships, path)
+        with open(path) as f:
+            assert f.read() == legacy(tables, relationships)
+
+
 def test_import_render_er():
     from eralchemy import render_er  # noqa: F401
+
+
+def test_render_er_several_outputs(tmpdir, monkeypatch):
+    layouts = []
+    layout = AGraph.layout
+    monkeypatch.setattr(AGraph, 'layout', lambda graph, *args, **kwargs: layouts.append(layout(graph, *args, **kwargs)))
+    outputs = [str(tmpdir.join('erd.' + extension)) for extension in ('png', 'svg', 'pdf', 'dot', 'er')]
+    render_er(markdown.split('\n'), outputs, exclude_tables=['exclude'])
+    assert len(layouts) == 1
+    for output in outputs:
+        assert os.path.getsize(output) > 0
+    with open(outputs[1]) as f:
+        assert '<svg' in f.read()
+
+    for output in outputs[3:]:
+        expected = str(tmpdir.join('expected.' + output.split('.')[-1]))
+        render_er(markdown.split('\n'), expected, exclude_tables=['exclude'])
+        with open(output) as f, open(expected) as g:
+            assert f.read() == g.read()
+
+
+def test_get_layout_engine():
+    assert get_layout_engine('neato', tables) == 'neato'
+    assert get_layout_engine('auto', tables) == 'dot'
+    assert get_layout_engine('auto', tables * 200) == 'sfdp'
+    with pytest.raises(ValueError):
+        get_layout_engine('unknown', tables)
+
+
+@pytest.mark.parametrize('prog', sorted(LAYOUT_ENGINES_ATTRIBUTES) + ['auto'])
+def test_render_er_layout_engine(tmpdir, prog):
+    graph = intermediary_to_graph(tables, relationships, get_layout_engine(prog, tables))
+    for name, value in LAYOUT_ENGINES_ATTRIBUTES[get_layout_engine(prog, tables)].items():
+        assert graph.graph_attr[name] == value
+    outputs = [str(tmpdir.join('erd.svg')), str(tmpdir.join('several.svg')), str(tmpdir.join('several.png'))]
+    render_er(markdown.split('\n'), outputs[0], prog=prog)
+    render_er(markdown.split('\n'), outputs[1:], prog=prog)
+    for output in outputs:
+        assert os.path.getsize(output) > 0
+    with open(outputs[0]) as f:
+        svg = f.read()
+    for table in tables:
+        assert '<title>{}</title>'.format(table.name) in svg
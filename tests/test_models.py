@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+from eralchemy.models import Column
+from tests.common import parent_id, relation, child, parent
+
+
+def test_models_slots():
+    for element in (parent_id, relation, parent):
+        assert not hasattr(element, '__dict__')
+    assert parent_id == Column(name='id', type=u'INTEGER', is_key=True)
+    assert parent_id != Column(name='id', type=u'INTEGER', is_key=False)
+    assert parent_id != child
+    assert parent_id != 'id'
+
+
+def test_models_eq_subclass():
+    class SlottedColumn(Column):
+        __slots__ = ()
+
+    column = SlottedColumn(name='a', type='INT', is_key=True)
+    assert not hasattr(column, '__dict__')
+    assert column == SlottedColumn(name='a', type='INT', is_key=True)
+    assert column != SlottedColumn(name='b', type='TEXT', is_key=False)
+    assert column != Column(name='a', type='INT', is_key=True)
@@ -1,4 +1,7 @@
 # -*- coding: utf-8 -*-
+import gzip
+import io
+
 import pytest
 from eralchemy.main import _intermediary_to_markdown
 from eralchemy.parser import (
@@ -10,7 +13,11 @@ from eralchemy.parser import (
     NoCurrentTableException,
     update_models,
     ParsingException,
-    line_iterator_to_intermediary
+    ParsingState,
+    line_iterator_to_intermediary,
+    markdown_file_to_intermediary,
+    mmap_file_to_intermediary,
+    split_lines_in_blocks,
 )
 from eralchemy.models import Column, Table, Relation
 from tests import common as c
@@ -87,6 +94,22 @@ def test_parse_line():
         assert isinstance(rv, Table)
 
 
+def test_parse_line_same_as_models_re():
+    lines = elements_lst + [
+        'parent_id--old {label:"INTEGER"}',
+        'a--b *--1 c',
+        '*[weird] {label:"INTEGER"}',
+        '[]',
+        'player *--1',
+    ]
+    for line in lines:
+        for typ in [Table, Relation, Column]:
+            match = typ.RE.match(line)
+            if match:
+                assert parse_line(line) == typ.make_from_match(match)
+                break
+
+
 def test_update_models_fails_no_current_table():
     for new_obj in (c.relation, c.parent_id):
         with pytest.raises(NoCurrentTableException):
@@ -168,12 +191,125 @@ def test_update_models_add_column():
     assert c.parent_name in tables[0].columns
 
 
+def test_parsing_state_update():
+    state = ParsingState()
+    for new_obj in (Table(name='parent', columns=[]), c.parent_id, c.parent_name,
+                    Table(name='child', columns=[]), c.child_id, c.relation):
+        state.update(new_obj)
+    assert [t.name for t in state.tables] == ['parent', 'child']
+    assert state.current_table.name == 'child'
+    assert state.relations == [c.relation]
+    assert state.tables_names == {'parent', 'child'}
+    assert state.columns_names == {'parent': {'id', 'name'}, 'child': {'id'}}
+
+
+def test_parsing_state_fails_duplicates():
+    state = ParsingState(current_table=c.parent, tables=[c.parent])
+    with pytest.raises(DuplicateColumnException):
+        state.update(c.parent_name)
+    with pytest.raises(DuplicateTableException):
+        state.update(Table(name='parent', columns=[]))
+    assert state.tables == [c.parent]
+
+
+def test_integration_parser_many_tables():
+    lines = []
+    for i in range(2000):
+        lines += ['[table_{}]'.format(i), '*id {label:"INTEGER"}', 'name {label:"VARCHAR(255)"}']
+    lines += ['table_{} *--1 table_{}'.format(i, i + 1) for i in range(1999)]
+    tables, relations = line_iterator_to_intermediary(lines)
+    assert len(tables) == 2000
+    assert len(relations) == 1999
+    assert all(len(t.columns) == 2 for t in tables)
+
+
+def test_split_lines_in_blocks():
+    lines = ['[a]', 'id', 'name', '[b]', 'id', '[c]', 'a *--1 b']
+    blocks = list(split_lines_in_blocks(((i, line, line) for i, line in enumerate(lines)), 2))
+    assert [[line for _, line, _ in block] for block in blocks] == [
+        ['[a]', 'id', 'name'], ['[b]', 'id'], ['[c]', 'a *--1 b']]
+
+
+def test_integration_parser_processes():
+    lines = c.markdown.split('\n') * 3 + ['parent *--? child']
+    with pytest.raises(ParsingException) as expected:
+        line_iterator_to_intermediary(lines)
+    with pytest.raises(ParsingException) as actual:
+        line_iterator_to_intermediary(lines, processes=2, block_size=4)
+    assert actual.value.args[0] == expected.value.args[0]
+    assert 'Error on line 15: ' in actual.value.args[0]
+
+    tables, relations = line_iterator_to_intermediary(c.markdown.split('\n'), processes=2, block_size=4)
+    assert tables == c.tables
+    assert relations == [c.relation, c.exclude_relation]
+
+
 def test_integration_parser():
     tables, relations = line_iterator_to_intermediary(c.markdown.split('\n'))
     c.assert_lst_equal(tables, c.tables)
     c.assert_lst_equal(relations, [c.relation, c.exclude_relation])
 
 
+def test_markdown_file_to_intermediary(tmpdir):
+    path = tmpdir.join('markdown.er')
+    path.write(c.markdown)
+    tables, relations = markdown_file_to_intermediary(str(path))
+    c.assert_lst_equal(tables, c.tables)
+    c.assert_lst_equal(relations, [c.relation, c.exclude_relation])
+
+
+def test_markdown_file_to_intermediary_text_stream():
+    tables, relations = markdown_file_to_intermediary(io.StringIO(c.markdown))
+    c.assert_lst_equal(tables, c.tables)
+    c.assert_lst_equal(relations, [c.relation, c.exclude_relation])
+
+
+def test_markdown_file_to_intermediary_compressed_stream(tmpdir):
+    path = str(tmpdir.join('markdown.er.gz'))
+    with gzip.open(path, 'wt') as f:
+        f.write(c.markdown)
+    for mode in ('rt', 'rb'):
+        with gzip.open(path, mode) as f:
+            tables, relations = markdown_file_to_intermediary(f)
+        c.assert_lst_equal(tables, c.tables)
+        c.assert_lst_equal(relations, [c.relation, c.exclude_relation])
+
+
+def test_markdown_file_to_intermediary_binary_stream_left_open():
+    stream = io.BytesIO(u'[commandé]\n    *id\n'.encode('utf-8'))
+    tables, _ = markdown_file_to_intermediary(stream)
+    assert not stream.closed
+    assert tables[0].name == u'commandé'
+
+
+def test_mmap_file_to_intermediary(tmpdir):
+    markdowns = [
+        c.markdown,
+        c.markdown.strip(),
+        c.markdown.replace('\n', '\r\n'),
+        '[parent]  # comment\n#  *id {label:"INTEGER"}\n   \n name {label:"VARCHAR(255)"} #comment\n',
+        '',
+    ]
+    for i, markdown in enumerate(markdowns):
+        path = tmpdir.join('markdown_{}.er'.format(i))
+        path.write_binary(markdown.encode('utf-8'))
+        expected_tables, expected_relations = markdown_file_to_intermediary(str(path))
+        tables, relations = markdown_file_to_intermediary(str(path), use_mmap=True)
+        assert [t.name for t in tables] == [t.name for t in expected_tables]
+        assert tables == expected_tables
+        assert relations == expected_relations
+
+
+def test_mmap_file_to_intermediary_errors(tmpdir):
+    path = tmpdir.join('markdown_broken.er')
+    path.write('[parent]\n*id {label:"INTEGER"}\n*id {label:"INTEGER"}\nparent *--? child\n')
+    with pytest.raises(ParsingException) as expected:
+        markdown_file_to_intermediary(str(path))
+    with pytest.raises(ParsingException) as actual:
+        mmap_file_to_intermediary(str(path))
+    assert actual.value.args[0] == expected.value.args[0]
+
+
 def test_generate_and_parse():
     markdown = _intermediary_to_markdown(c.tables, [c.relation])
     tables, relations = line_iterator_to_intermediary(markdown.split('\n'))
@@ -193,3 +329,20 @@ def test_integration_errors():
     with pytest.raises(ParsingException):
         line_iterator_to_intermediary(markdown_broken.split('\n'))
     # TODO check error
+
+
+def test_integration_errors_line_numbers():
+    markdown_broken = [
+        '[parent]',
+        '*id {label:"INTEGER"}',
+        '*id {label:"INTEGER"}',
+        '[parent]',
+        'parent *--? child',
+    ]
+    with pytest.raises(ParsingException) as e:
+        line_iterator_to_intermediary(markdown_broken)
+    message = e.value.args[0]
+    assert 'following errors' in message
+    assert 'Error on line 2: *id {label:"INTEGER"}' in message
+    assert 'Error on line 3: [parent]' in message
+    assert 'Error on line 4: parent *--? child' in message
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+import struct
+
+import pytest
+
+from eralchemy.main import all_to_intermediary, render_er
+from eralchemy.models import Column, Relation, Table
+from eralchemy.snapshot import HEADER, snapshot_dumps, snapshot_loads
+from tests.common import tables, relationships, markdown
+
+unicode_table = Table(
+    name=u'commandé',
+    columns=[Column(name='id', is_key=True), Column(name=u'prénom', type='VARCHAR(255)'), Column(name='empty')],
+)
+empty_table = Table(name='empty', columns=[])
+no_card_relation = Relation(right_col=u'commandé', left_col='parent', right_cardinality='', left_cardinality='')
+all_tables = tables + [unicode_table, empty_table]
+all_relationships = relationships + [no_card_relation]
+
+
+def check_round_trip(expected_tables, expected_relationships, actual_tables, actual_relationships):
+    assert [t.name for t in actual_tables] == [t.name for t in expected_tables]
+    for actual, expected in zip(actual_tables, expected_tables):
+        assert actual.columns == expected.columns
+    assert actual_relationships == expected_relationships
+
+
+def test_snapshot_round_trip():
+    data = snapshot_dumps(all_tables, all_relationships)
+    check_round_trip(all_tables, all_relationships, *snapshot_loads(data))
+
+
+def test_snapshot_empty():
+    assert snapshot_loads(snapshot_dumps([], [])) == ([], [])
+
+
+def test_snapshot_strings_stored_once():
+    actual_tables, _ = snapshot_loads(snapshot_dumps(all_tables, all_relationships))
+    assert actual_tables[0].columns[0].name is actual_tables[1].columns[0].name
+
+
+def test_snapshot_invalid():
+    with pytest.raises(ValueError):
+        snapshot_loads(b'[parent]\n    *id')
+    data = snapshot_dumps(all_tables, all_relationships)
+    with pytest.raises(ValueError):
+        snapshot_loads(data[:4] + b'\xff\xff' + data[6:])
+    for truncated in [data[:-3], data[:HEADER.size + 2], data[:-len(all_relationships) * 16]]:
+        with pytest.raises(ValueError):
+            snapshot_loads(truncated)
+    with pytest.raises(ValueError):
+        snapshot_loads(data + b'\x00')
+    # The first string id of the relations is out of the string table.
+    offset = len(data) - len(all_relationships) * 16
+    with pytest.raises(ValueError):
+        snapshot_loads(data[:offset] + struct.pack('<I', 1000) + data[offset + 4:])
+
+
+def test_snapshot_file(tmpdir):
+    output = str(tmpdir.join('snapshot.erbin'))
+    render_er(markdown.split('\n'), output)
+    check_round_trip(*(all_to_intermediary(markdown.split('\n')) + all_to_intermediary(output)))
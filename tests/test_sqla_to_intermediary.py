@@ -1,7 +1,14 @@
 # -*- coding: utf-8 -*-
 
+import sqlite3
+
+import pytest
+from sqlalchemy import event, create_engine, inspect, text, Enum, Integer, MetaData, String
+from sqlalchemy.dialects import postgresql
+
 from eralchemy.sqla import column_to_intermediary, declarative_to_intermediary, database_to_intermediary, \
-    table_to_intermediary
+    table_to_intermediary, format_type, format_name, has_bulk_reflection, inspector_to_intermediary, \
+    metadata_to_intermediary, tables_to_reflect, schemas_to_intermediary
 from tests.common import parent_id, parent_name, child_id, child_parent_id, Parent, Child, Base, \
     child, parent, Relation, Table, relation, exclude_relation, \
     check_intermediary_representation_simple_all_table
@@ -39,6 +46,20 @@ def test_columns_child():
     )
 
 
+def test_format_type_memoized_and_interned():
+    assert format_type(String(255)) == 'VARCHAR(255)'
+    assert format_type(String(255)) is format_type(String(255))
+    assert format_type(String(255)) != format_type(String(20))
+    assert format_type(postgresql.ARRAY(Integer)) == str(postgresql.ARRAY(Integer))
+    assert format_type(postgresql.ARRAY(Integer)) is format_type(postgresql.ARRAY(Integer))
+    assert format_type(Enum('a', 'bc')) == 'VARCHAR(2)'
+    assert format_type(Enum('a', 'bcd')) == 'VARCHAR(3)'
+
+
+def test_format_name_interned():
+    assert format_name(''.join(['par', 'ent'])) is format_name('parent')
+
+
 def test_declarative_to_intermediary():
     tables, relationships = declarative_to_intermediary(Base)
     check_intermediary_representation_simple_all_table(tables, relationships)
@@ -76,6 +97,26 @@ def test_database_to_intermediary_with_schema():
     assert exclude_relation not in relationships
 
 
+def test_database_to_intermediary_foreign_key_to_default_schema():
+    db_uri = create_db()
+    engine = create_engine(db_uri)
+    with engine.begin() as connection:
+        connection.execute(text('CREATE SCHEMA IF NOT EXISTS sales'))
+        connection.execute(text('DROP TABLE IF EXISTS sales.orders'))
+        connection.execute(text('CREATE TABLE sales.orders (id INTEGER PRIMARY KEY, parent_id INTEGER REFERENCES '
+                                'public.parent(id))'))
+    # The referred schema of the foreign key is None, parent being on the search path.
+    metadata = MetaData(schema='sales')
+    metadata.reflect(engine)
+    expected_tables, expected_relationships = metadata_to_intermediary(metadata)
+    assert sorted(t.name for t in expected_tables) == ['parent', 'sales.orders']
+    for kwargs in ({}, {'focus': ['sales.orders']}):
+        tables, relationships = database_to_intermediary(db_uri, schema='sales', **kwargs)
+        assert sorted(tables, key=lambda t: t.name) == sorted(expected_tables, key=lambda t: t.name)
+        assert relationships == expected_relationships == [Relation('sales.orders', 'parent', '?', '*')]
+    engine.dispose()
+
+
 def test_flask_sqlalchemy():
     from flask_sqlalchemy import SQLAlchemy
     from flask import Flask
@@ -88,3 +129,56 @@ def test_flask_sqlalchemy():
     model.metadata = Base.metadata
     tables, relationships = all_to_intermediary(db.Model)
     check_intermediary_representation_simple_all_table(tables, relationships)
+
+
+def test_database_to_intermediary_reflects_selected_tables(tmpdir):
+    db_uri = create_db(db_uri='sqlite:///{}'.format(tmpdir.join('test.db')), use_sqlite=True)
+
+    def tables_names(**kwargs):
+        tables, _ = database_to_intermediary(db_uri, **kwargs)
+        return sorted(t.name for t in tables)
+    assert tables_names() == ['child', 'exclude', 'parent']
+    assert tables_names(include_tables=['child']) == ['child', 'parent']
+    assert tables_names(exclude_tables=['ex*']) == ['child', 'parent']
+    assert tables_names(focus=['child']) == ['child', 'parent']
+    assert tables_names(focus=['child'], depth=2) == ['child', 'exclude', 'parent']
+    assert tables_names(focus=['parent'], exclude_tables=['exclude']) == ['child', 'parent']
+
+
+@pytest.mark.skipif(not has_bulk_reflection(inspect(create_engine('sqlite://'))),
+                    reason='The bulk reflection needs SQLAlchemy 2.')
+@pytest.mark.parametrize('kwargs', [{}, {'include_tables': ['child']}, {'focus': ['exclude']}])
+def test_inspector_to_intermediary_same_as_reflect(tmpdir, kwargs):
+    engine = create_engine(create_db(db_uri='sqlite:///{}'.format(tmpdir.join('test.db')), use_sqlite=True))
+    only = tables_to_reflect(inspect(engine), **kwargs)
+    metadata = MetaData()
+    metadata.reflect(engine, only=only)
+    expected_tables, expected_relationships = metadata_to_intermediary(metadata)
+    tables, relationships = inspector_to_intermediary(inspect(engine), only=only)
+    assert sorted(tables, key=lambda t: t.name) == sorted(expected_tables, key=lambda t: t.name)
+    assert sorted(relationships, key=str) == sorted(expected_relationships, key=str)
+
+
+def test_schemas_to_intermediary(tmpdir):
+    db_uri = create_db(db_uri='sqlite:///{}'.format(tmpdir.join('test.db')), use_sqlite=True)
+    other_path = str(tmpdir.join('other.db'))
+    connection = sqlite3.connect(other_path)
+    connection.execute('CREATE TABLE author (id INTEGER PRIMARY KEY)')
+    connection.execute('CREATE TABLE book (id INTEGER PRIMARY KEY, author_id INTEGER REFERENCES author(id))')
+    connection.commit()
+    connection.close()
+    engine = create_engine(db_uri)
+
+    @event.listens_for(engine, 'connect')
+    def attach(dbapi_connection, connection_record):
+        dbapi_connection.execute("ATTACH DATABASE '{}' AS other".format(other_path))
+
+    tables, relationships = schemas_to_intermediary(engine, ['main', 'other'])
+    assert sorted(t.name for t in tables) == ['main.child', 'main.exclude', 'main.parent', 'other.author', 'other.book']
+    assert Relation('main.child', 'main.parent', '?', '*') in relationships
+    assert Relation('other.book', 'other.author', '?', '*') in relationships
+    assert len(relationships) == 3
+
+    tables, relationships = schemas_to_intermediary(engine, ['main', 'other'], focus=['other.book'])
+    assert sorted(t.name for t in tables) == ['other.author', 'other.book']
+    assert relationships == [Relation('other.book', 'other.author', '?', '*')]